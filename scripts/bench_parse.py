@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the Cabrillo parsers in create_sql_db.py: the str parser
+(parse_log_text) against the fast path (parse_log_bytes). Logs are read
+into memory first so only parsing is timed; both parsers must produce
+identical metadata and rows.
+"""
+
+import argparse
+import time
+
+from create_sql_db import NYQPDatabaseCreator
+from log_sources import iter_contents, list_sources
+from paths import CONTEST_DB, LOGS_DIR
+
+def time_parser(parser, logs, repeat):
+    """Best-of-N seconds to parse every log; returns (seconds, results)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parser(log_file, raw) for log_file, raw in logs]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the str and bytes Cabrillo parsers.')
+    parser.add_argument('--logs-dir', default=LOGS_DIR)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    creator = NYQPDatabaseCreator(args.logs_dir, CONTEST_DB)
+    logs = list(iter_contents(list_sources(args.logs_dir)))
+    lines = sum(raw.count(b'\n') + 1 for _, raw in logs)
+    print(f"{len(logs)} logs, {lines:,} lines, best of {args.repeat}")
+
+    str_time, str_results = time_parser(creator.parse_log_text, logs, args.repeat)
+    bytes_time, bytes_results = time_parser(creator.parse_log_bytes, logs, args.repeat)
+
+    for (log_file, _), expected, actual in zip(logs, str_results, bytes_results):
+        assert expected == actual, f'parsers disagree on {log_file}'
+    qsos = sum(len(rows) for _, rows in bytes_results)
+
+    print(f"  str parser:  {str_time:.3f}s  {lines / str_time:,.0f} lines/s")
+    print(f"  fast parser: {bytes_time:.3f}s  {lines / bytes_time:,.0f} lines/s")
+    print(f"  {qsos:,} QSOs identical, {str_time / bytes_time:.1f}x faster")
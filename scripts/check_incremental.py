@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Check that an incrementally updated database matches a full rebuild.
+
+Builds the same logs from scratch into a temporary directory and compares
+every table create_sql_db.py writes with the given database. Row ids and
+callsign ids depend on the order logs arrived in, so ids that refer to
+callsigns are compared as the calls themselves and qsos.id is left out;
+the callsigns table itself is not compared (an update may keep calls no
+longer used by any log).
+
+    python create_sql_db.py && python check_incremental.py
+
+Exits with status 1 if any table differs.
+"""
+
+import argparse
+import sqlite3
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from create_sql_db import NYQPDatabaseCreator
+from paths import CONTEST_DB, LOGS_DIR
+
+# Tables compared, and the columns holding callsigns ids
+TABLES = ('stations', 'qsos', 'log_manifest', 'station_counts', 'call_counts', 'interval_counts',
+          'station_bands', 'multipliers', 'leaderboard', 'station_rates', 'station_buckets')
+CALL_ID_COLUMNS = {'call_id', 'station_id', 'tx_call_id', 'rx_call_id'}
+# Order-dependent columns left out (match_id is set by match_qsos.py, which
+# refers to qsos.id; mtime_ns and path may differ for the same content)
+SKIPPED_COLUMNS = {('qsos', 'id'), ('qsos', 'match_id'), ('qsos', 'match_status'),
+                   ('log_manifest', 'path'), ('log_manifest', 'mtime_ns')}
+
+def table_rows(conn, table):
+    """Every row of a table with callsign ids replaced by their calls, as a Counter."""
+    columns = []
+    for row in conn.execute(f'PRAGMA table_info({table})'):
+        name = row[1]
+        if (table, name) in SKIPPED_COLUMNS:
+            continue
+        if name in CALL_ID_COLUMNS:
+            columns.append(f'(SELECT call FROM callsigns WHERE id = {table}.{name})')
+        else:
+            columns.append(name)
+    return Counter(conn.execute(f"SELECT {', '.join(columns)} FROM {table}"))
+
+def compare(db_path, full_path, examples=3):
+    """Print the differences per table; returns True if every table matches."""
+    updated = sqlite3.connect(db_path)
+    rebuilt = sqlite3.connect(full_path)
+    same = True
+    try:
+        for table in TABLES:
+            missing = table_rows(rebuilt, table) - table_rows(updated, table)
+            extra = table_rows(updated, table) - table_rows(rebuilt, table)
+            if not missing and not extra:
+                print(f"{table}: OK")
+                continue
+            same = False
+            print(f"{table}: {sum(missing.values())} rows missing, {sum(extra.values())} extra")
+            for label, rows in (('missing', missing), ('extra', extra)):
+                for row in list(rows)[:examples]:
+                    print(f"  {label}: {row}")
+    finally:
+        updated.close()
+        rebuilt.close()
+    return same
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare an incrementally updated database with a full rebuild.')
+    parser.add_argument('--logs-dir', default=LOGS_DIR)
+    parser.add_argument('--db', default=CONTEST_DB)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full_path = Path(tmp) / 'contest.db'
+        NYQPDatabaseCreator(args.logs_dir, full_path).create_database(full=True)
+        print()
+        if not compare(args.db, full_path):
+            sys.exit(1)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Shared read-only access to the contest database for the generator scripts.
+
+connect() opens each database once per process, read-only through an SQLite
+URI (mode=ro), and hands the same connection to every caller, so a script
+whose chart or map functions each used to open their own connection now
+shares one. sqlite3 keeps a per-connection cache of prepared statements
+keyed by SQL text; the cache is raised to CACHED_STATEMENTS so repeated
+queries (one per mobile log, one per chart) are prepared only once.
+
+The query helpers below return namedtuples for the lookups more than one
+generator needs; pandas callers pass connect() to read_sql_query.
+"""
+
+import atexit
+import sqlite3
+from collections import namedtuple
+from pathlib import Path
+
+from paths import CONTEST_DB
+
+# Prepared statements kept per connection (sqlite3's default is 128)
+CACHED_STATEMENTS = 512
+
+MobileStation = namedtuple('MobileStation', 'callsign log_file')
+LeaderEntry = namedtuple('LeaderEntry', 'rank call value')
+TrackPoint = namedtuple('TrackPoint', 'minute county')
+MobileQSO = namedtuple('MobileQSO', 'call minute county')
+
+_connections = {}
+
+def connect(db_path=CONTEST_DB):
+    """Return the shared read-only connection to db_path, opening it on first use.
+
+    A missing database raises sqlite3.OperationalError instead of creating
+    an empty file.
+    """
+    path = Path(db_path).resolve()
+    conn = _connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(f'{path.as_uri()}?mode=ro', uri=True, cached_statements=CACHED_STATEMENTS)
+        _connections[path] = conn
+    return conn
+
+@atexit.register
+def close_all():
+    """Close every shared connection (also run at interpreter exit)."""
+    while _connections:
+        _connections.popitem()[1].close()
+
+def placeholders(values):
+    return ', '.join('?' * len(values))
+
+def scalar(sql, params=(), db_path=CONTEST_DB):
+    """Return the single value of a one-row, one-column query."""
+    return connect(db_path).execute(sql, params).fetchone()[0]
+
+def counts(sql, params=(), db_path=CONTEST_DB):
+    """Return {key: count} from a query selecting (key, count) rows."""
+    return dict(connect(db_path).execute(sql, params))
+
+def mobile_stations(db_path=CONTEST_DB):
+    """MOBILE stations with the callsign from their QSO records (logs without QSOs are skipped)."""
+    return [MobileStation(callsign, log_file) for log_file, callsign in connect(db_path).execute('''
+        SELECT s.log_file,
+               (SELECT q.station_call FROM qsos q WHERE q.log_file = s.log_file LIMIT 1)
+        FROM stations s
+        WHERE s.station_type = 'MOBILE'
+    ''') if callsign is not None]
+
+def worked_county_qsos(counties, db_path=CONTEST_DB):
+    """Return {rx_county: QSOs} for the given counties."""
+    return counts(f'''
+        SELECT rx_county, COUNT(*) as qsos
+        FROM qsos
+        WHERE rx_county IN ({placeholders(counties)})
+        GROUP BY rx_county
+    ''', list(counties), db_path)
+
+def leaderboard(board, key, limit, db_path=CONTEST_DB):
+    """The top `limit` entries of one ranking (see leaderboards.py)."""
+    return [LeaderEntry(*row) for row in connect(db_path).execute('''
+        SELECT rank, call, value
+        FROM leaderboard
+        WHERE board = ? AND key = ? AND rank <= ?
+        ORDER BY rank
+    ''', (board, key, limit))]
+
+def leaders(board, limit, db_path=CONTEST_DB):
+    """Return {key: top `limit` entries} for every key of one leaderboard."""
+    top = {}
+    for key, *row in connect(db_path).execute('''
+        SELECT key, rank, call, value
+        FROM leaderboard
+        WHERE board = ? AND rank <= ?
+        ORDER BY key, rank
+    ''', (board, limit)):
+        top.setdefault(key, []).append(LeaderEntry(*row))
+    return top
+
+def board_totals(board, db_path=CONTEST_DB):
+    """Return {key: sum of every entry's value} for one leaderboard."""
+    return counts('''
+        SELECT key, SUM(value)
+        FROM leaderboard
+        WHERE board = ?
+        GROUP BY key
+    ''', (board,), db_path)
+
+def mobile_county_qsos(log_files, counties, db_path=CONTEST_DB):
+    """QSOs from the given logs sent from the given counties, by station and time."""
+    return [MobileQSO(*row) for row in connect(db_path).execute(f'''
+        SELECT station_call, minute, tx_county
+        FROM qsos
+        WHERE log_file IN ({placeholders(log_files)}) AND tx_county IN ({placeholders(counties)})
+              AND minute IS NOT NULL
+        ORDER BY station_call, datetime
+    ''', list(log_files) + list(counties))]
+
+def track_points(log_file, db_path=CONTEST_DB):
+    """One log's (minute, tx_county) points in time order."""
+    return [TrackPoint(*row) for row in connect(db_path).execute('''
+        SELECT minute, tx_county
+        FROM qsos
+        WHERE log_file = ? AND minute IS NOT NULL
+        ORDER BY datetime
+    ''', (log_file,))]
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Query several contest years' databases as one store.
+
+Each year keeps its own contest.db (see paths.contest_db), built by the
+usual pipeline with NYQP_DIR pointing at that year's directory, so a year is
+a partition that can be rebuilt on its own. ContestStore attaches the
+years' databases read-only to one connection and defines temporary views
+over them with a leading year column:
+
+    stations, qsos, callsigns   UNION ALL of every year's table
+    bands                       the band lookup table (the same every year)
+
+A query for one year filters on year, which SQLite pushes into each arm of
+the views so only that year's table (and its indexes) is read; comparing
+years is a GROUP BY year over the same views. Callsign ids are only
+unique within a year, so joins to callsigns must match on year as well.
+
+    with ContestStore() as store:
+        store.execute('SELECT year, COUNT(*) FROM qsos GROUP BY year')
+"""
+
+import argparse
+import sqlite3
+
+from paths import CONTEST_YEAR, CONTESTS_DIR, contest_db
+
+# Tables exposed with a year column
+YEAR_TABLES = ('stations', 'qsos', 'callsigns')
+
+# SQLite's default limit on attached databases
+MAX_YEARS = 10
+
+def available_years():
+    """Years with a built contest.db, oldest first."""
+    years = {CONTEST_YEAR}
+    for path in CONTESTS_DIR.glob('NYQP-*'):
+        year = path.name[len('NYQP-'):]
+        if year.isdigit():
+            years.add(int(year))
+    return sorted(year for year in years if contest_db(year).exists())
+
+class ContestStore:
+    """One connection over every year's contest database."""
+
+    def __init__(self, years=None):
+        self.years = sorted(years) if years is not None else available_years()
+        if not self.years:
+            raise FileNotFoundError(f"No contest databases found under {CONTESTS_DIR}")
+        if len(self.years) > MAX_YEARS:
+            raise ValueError(f"At most {MAX_YEARS} years can be attached at once")
+
+        self.conn = sqlite3.connect('file::memory:', uri=True)
+        for year in self.years:
+            path = contest_db(year)
+            if not path.exists():
+                raise FileNotFoundError(f"No contest database for {year}: {path}")
+            self.conn.execute(f"ATTACH DATABASE ? AS y{year}", (f'{path.as_uri()}?mode=ro',))
+        self.create_views()
+
+    def table_columns(self, year, table):
+        return [row[1] for row in self.conn.execute(f'PRAGMA y{year}.table_info({table})')]
+
+    def create_views(self):
+        """Create the year views over the columns every year's table has.
+
+        Older databases may predate a column; it is left out of the view
+        rather than failing the whole store.
+        """
+        for table in YEAR_TABLES:
+            columns = self.table_columns(self.years[-1], table)
+            for year in self.years[:-1]:
+                present = set(self.table_columns(year, table))
+                columns = [column for column in columns if column in present]
+            select = ', '.join(columns)
+            arms = ' UNION ALL '.join(f'SELECT {year} AS year, {select} FROM y{year}.{table}'
+                                      for year in self.years)
+            self.conn.execute(f'CREATE TEMP VIEW {table} AS {arms}')
+        self.conn.execute(f'CREATE TEMP VIEW bands AS SELECT * FROM y{self.years[-1]}.bands')
+
+    def execute(self, sql, params=()):
+        """Run a query over the views and return all rows."""
+        return self.conn.execute(sql, params).fetchall()
+
+    def year_db(self, year):
+        """Path of one year's database, for scripts that work on a single year."""
+        if year not in self.years:
+            raise KeyError(f"{year} is not in this store ({', '.join(map(str, self.years))})")
+        return contest_db(year)
+
+    def qsos_per_hour(self, minutes):
+        """Return [(year, hour, qsos)] for non-duplicate QSOs in the first `minutes` of each contest.
+
+        qsos.minute counts from each year's own start, so hour 0 is the
+        first hour of every contest. Served by idx_qsos_dup_minute_band.
+        """
+        return self.execute("""
+            SELECT year, minute / 60 AS hour, COUNT(*)
+            FROM qsos
+            WHERE is_dup = 0 AND minute >= 0 AND minute < ?
+            GROUP BY year, hour
+            ORDER BY year, hour
+        """, (minutes,))
+
+    def year_totals(self):
+        """Return {year: (logs, qsos)}."""
+        logs = dict(self.execute('SELECT year, COUNT(*) FROM stations GROUP BY year'))
+        qsos = dict(self.execute('SELECT year, COUNT(*) FROM qsos GROUP BY year'))
+        return {year: (logs.get(year, 0), qsos.get(year, 0)) for year in self.years}
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarize the contest years in the store.')
+    parser.add_argument('years', nargs='*', type=int, help='years to include (default: all built years)')
+    args = parser.parse_args()
+
+    with ContestStore(args.years or None) as store:
+        for year, (logs, qsos) in store.year_totals().items():
+            print(f"{year}: {logs:,} logs, {qsos:,} QSOs ({store.year_db(year)})")
@@ -3,64 +3,51 @@
 Generate NYQP 2025 analysis charts matching 2024 style
 """
 
-import sqlite3
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-from pathlib import Path
+
+from contest_data import connect
+from contest_store import ContestStore, available_years
+from create_sql_db import CONTEST_MINUTES, CONTEST_START
+from paths import CHART_PREFIX, CHARTS_DIR, CONTEST_DB, YEAR_COMPARISON_CHART
 
 def create_charts():
     """Generate the three main analysis charts."""
     
-    # Database connections
-    meta_db = '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data/contest_meta.db'
-    qso_db = '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data/contest_qsos.db'
-    output_dir = Path('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/charts')
+    # Database and output locations
+    db_path = CONTEST_DB
+    output_dir = CHARTS_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
     
     # Chart 1: Box Plot of Score by Category
-    create_score_boxplot(meta_db, qso_db, output_dir)
+    create_score_boxplot(db_path, output_dir)
     
     # Chart 2: Distribution of QSOs by Location and Mode
-    create_qso_distribution(meta_db, qso_db, output_dir)
+    create_qso_distribution(db_path, output_dir)
     
     # Chart 3: Histogram of QSO Totals
-    create_qso_histogram(qso_db, output_dir)
+    create_qso_histogram(db_path, output_dir)
     
     # Chart 4: Band Activity Over Time (individual charts)
-    create_band_activity_chart(meta_db, qso_db, output_dir)
+    create_band_activity_chart(db_path, output_dir)
     
     # Chart 5: Stacked Band Activity by Mode
-    create_stacked_band_charts(meta_db, qso_db, output_dir)
-
-def create_score_boxplot(meta_db, qso_db, output_dir):
-    """Create box plot of scores by category using claimed scores with QSO count fallback."""
-    
-    # Get station metadata
-    meta_conn = sqlite3.connect(meta_db)
-    stations = pd.read_sql_query("""
-        SELECT callsign, operator_category, transmitter_category, station_type, power, mode, claimed_score
-        FROM stations
-        WHERE operator_category != 'CHECKLOG'
-    """, meta_conn)
-    meta_conn.close()
-    
-    # Get QSO counts per station (deduplicated)
-    qso_conn = sqlite3.connect(qso_db)
-    qso_counts = pd.read_sql_query("""
-        SELECT station_call, COUNT(*) as qso_count
-        FROM (
-            SELECT DISTINCT station_call, datetime, freq, tx_call, rx_call
-            FROM qsos
-        )
-        GROUP BY station_call
-    """, qso_conn)
-    qso_conn.close()
+    create_stacked_band_charts(db_path, output_dir)
     
-    # Merge data
-    data = pd.merge(stations, qso_counts, left_on='callsign', right_on='station_call', how='left')
+    # Chart 6: Year-over-year QSO rate, when earlier years have been built
+    create_year_comparison_chart(output_dir)
+
+def create_score_boxplot(db_path, output_dir):
+    """Create box plot of scores by category from the scores computed at ingest (scoring.py)."""
     
-    # Use QSO count (TX-side) for all stations
-    data['score'] = data['qso_count']
+    # Get station metadata with the computed score, so logs without a claimed score are included
+    data = pd.read_sql_query("""
+        SELECT s.callsign, s.operator_category, s.transmitter_category, s.station_type,
+               s.power, s.mode, s.claimed_score, s.computed_score AS score
+        FROM stations s
+        WHERE s.operator_category != 'CHECKLOG'
+    """, connect(db_path))
     
     # Filter out any remaining nulls and zeros
     data = data[(data['score'].notna()) & (data['score'] > 0)]
@@ -114,46 +101,42 @@ def create_score_boxplot(meta_db, qso_db, output_dir):
     # Create box plot with standard whisker calculation
     bp = plt.boxplot(box_data, tick_labels=categories_list, whis=1.5, showfliers=True)
     
-    plt.title('Box Plot of QSO Count by Category', fontsize=16)
+    plt.title('Box Plot of Score by Category', fontsize=16)
     plt.xlabel('category_id', fontsize=12)
-    plt.ylabel('QSO Count', fontsize=12)
+    plt.ylabel('Score', fontsize=12)
     plt.xticks(rotation=90, ha='right')
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
     
-    plt.savefig(output_dir / 'NYQP_2025_BoxPlotOfScoreByCategory.png', dpi=150, bbox_inches='tight')
+    plt.savefig(output_dir / f'{CHART_PREFIX}_BoxPlotOfScoreByCategory.png', dpi=150, bbox_inches='tight')
     plt.close()
     
     # Count how many stations included
     total_stations = len(data)
     print(f"Created box plot with {len(categories_list)} categories")
-    print(f"Total stations: {total_stations} (all using TX-side QSO counts)")
+    missing_claimed = data['claimed_score'].isna().sum()
+    print(f"Total stations: {total_stations} (computed scores; {missing_claimed} without a claimed score)")
 
-def create_qso_distribution(meta_db, qso_db, output_dir):
+def create_qso_distribution(db_path, output_dir):
     """Create QSO distribution by location and mode."""
     
-    # Get NY stations
-    meta_conn = sqlite3.connect(meta_db)
-    ny_stations = pd.read_sql_query("SELECT callsign FROM stations WHERE location = 'NY'", meta_conn)['callsign'].tolist()
-    meta_conn.close()
-    
-    # Get deduplicated QSO data (TX-side only)
-    qso_conn = sqlite3.connect(qso_db)
-    qsos = pd.read_sql_query("""
-        SELECT DISTINCT station_call, mode, tx_call, rx_call, datetime, freq
-        FROM qsos
-    """, qso_conn)
-    qso_conn.close()
-    
-    # Categorize by TX station location and mode
-    qsos['tx_location'] = qsos['tx_call'].apply(lambda x: 'NY' if x in ny_stations else 'Non-NY')
-    qsos['mode_clean'] = qsos['mode'].apply(lambda x: 'CW' if 'CW' in x else 'Phone')
+    # Count unique QSOs (TX-side only) by TX station location and mode,
+    # joining the per-call counts against the NY stations inside SQLite
+    counts_by_group = pd.read_sql_query("""
+        SELECT CASE WHEN ny.call_id IS NOT NULL THEN 'NY' ELSE 'Non-NY' END AS tx_location,
+               CASE WHEN cc.cw THEN 'CW' ELSE 'Phone' END AS mode_clean,
+               SUM(cc.unique_qsos) AS qsos
+        FROM call_counts cc
+        LEFT JOIN stations ny ON ny.call_id = cc.tx_call_id AND ny.location = 'NY'
+        GROUP BY tx_location, mode_clean
+    """, connect(db_path))
     
     # Count categories based on TX station
-    ny_cw = len(qsos[(qsos['tx_location'] == 'NY') & (qsos['mode_clean'] == 'CW')])
-    ny_phone = len(qsos[(qsos['tx_location'] == 'NY') & (qsos['mode_clean'] == 'Phone')])
-    non_ny_cw = len(qsos[(qsos['tx_location'] == 'Non-NY') & (qsos['mode_clean'] == 'CW')])
-    non_ny_phone = len(qsos[(qsos['tx_location'] == 'Non-NY') & (qsos['mode_clean'] == 'Phone')])
+    group_counts = {(row.tx_location, row.mode_clean): row.qsos for row in counts_by_group.itertuples()}
+    ny_cw = group_counts.get(('NY', 'CW'), 0)
+    ny_phone = group_counts.get(('NY', 'Phone'), 0)
+    non_ny_cw = group_counts.get(('Non-NY', 'CW'), 0)
+    non_ny_phone = group_counts.get(('Non-NY', 'Phone'), 0)
     
     categories = ['NY CW QSOs', 'NY Phone QSOs', 'Non-NY CW QSOs', 'Non-NY Phone QSOs']
     counts = [ny_cw, ny_phone, non_ny_cw, non_ny_phone]
@@ -175,20 +158,17 @@ def create_qso_distribution(meta_db, qso_db, output_dir):
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
     
-    plt.savefig(output_dir / 'NYQP_2025_DistributionOfQSOsByLocationAndMode.png', dpi=150, bbox_inches='tight')
+    plt.savefig(output_dir / f'{CHART_PREFIX}_DistributionOfQSOsByLocationAndMode.png', dpi=150, bbox_inches='tight')
     plt.close()
     print(f"Created QSO distribution chart - Total QSOs: {sum(counts):,}")
 
-def create_qso_histogram(qso_db, output_dir):
+def create_qso_histogram(db_path, output_dir):
     """Create histogram of QSO totals per station."""
     
-    qso_conn = sqlite3.connect(qso_db)
     qso_counts = pd.read_sql_query("""
-        SELECT station_call, COUNT(*) as qso_total
-        FROM qsos 
-        GROUP BY station_call
-    """, qso_conn)
-    qso_conn.close()
+        SELECT station_id, qsos as qso_total
+        FROM station_counts
+    """, connect(db_path))
     
     plt.figure(figsize=(10, 6))
     
@@ -206,50 +186,35 @@ def create_qso_histogram(qso_db, output_dir):
     
     plt.tight_layout()
     
-    plt.savefig(output_dir / 'NYQP_2025_HistogramOfQSO_Totals.png', dpi=150, bbox_inches='tight')
+    plt.savefig(output_dir / f'{CHART_PREFIX}_HistogramOfQSO_Totals.png', dpi=150, bbox_inches='tight')
     plt.close()
     print("Created QSO histogram")
 
-def create_band_activity_chart(meta_db, qso_db, output_dir):
+def load_band_intervals(db_path):
+    """Count QSOs per 15-minute interval, band and mode (CW/PH) over the contest period.
+    
+    Reads interval_counts, which the ingest keeps bucketed by 15 minutes,
+    band and mode class for the unique QSOs inside the contest period.
+    """
+    interval_counts = pd.read_sql_query("""
+        SELECT i.bucket,
+               b.name AS band,
+               CASE WHEN i.mode_class = 'CW' THEN 'CW' ELSE 'PH' END AS mode_clean,
+               SUM(i.qsos) AS count
+        FROM interval_counts i
+        JOIN bands b ON b.code = i.band
+        GROUP BY i.bucket, b.name, mode_clean
+        ORDER BY i.bucket
+    """, connect(db_path))
+    
+    interval_counts['dt'] = pd.Timestamp(CONTEST_START) + pd.to_timedelta(interval_counts['bucket'] * 15, unit='m')
+    return interval_counts[['dt', 'band', 'mode_clean', 'count']]
+
+def create_band_activity_chart(db_path, output_dir):
     """Create stacked area chart of QSO activity by band and mode over time."""
     
-    # Get QSO data with time and band info
-    qso_conn = sqlite3.connect(qso_db)
-    qsos = pd.read_sql_query("""
-        SELECT DISTINCT station_call, freq, mode, date, time
-        FROM qsos
-        ORDER BY date, time
-    """, qso_conn)
-    qso_conn.close()
-    
-    # Convert frequency to band
-    def freq_to_band(freq_str):
-        try:
-            freq = int(freq_str)
-            if 1800 <= freq <= 2000: return '160m'
-            elif 3500 <= freq <= 4000: return '80m'
-            elif 7000 <= freq <= 7300: return '40m'
-            elif 14000 <= freq <= 14350: return '20m'
-            elif 21000 <= freq <= 21450: return '15m'
-            elif 28000 <= freq <= 29700: return '10m'
-            else: return 'VHF+'
-        except:
-            return 'Unknown'
-    
-    qsos['band'] = qsos['freq'].apply(freq_to_band)
-    qsos['mode_clean'] = qsos['mode'].apply(lambda x: 'CW' if x == 'CW' else 'PH')
-    
-    # Create 15-minute intervals from date and time
-    qsos['time_minutes'] = qsos['time'].str[:2].astype(int) * 60 + qsos['time'].str[2:4].astype(int)
-    qsos['time_15min'] = (qsos['time_minutes'] // 15) * 15  # Round down to 15-minute intervals
-    qsos['hour_15min'] = qsos['time_15min'] // 60
-    qsos['min_15min'] = qsos['time_15min'] % 60
-    qsos['time_str'] = qsos['hour_15min'].astype(str).str.zfill(2) + ':' + qsos['min_15min'].astype(str).str.zfill(2) + ':00'
-    qsos['datetime_15min'] = qsos['date'] + ' ' + qsos['time_str']
-    qsos['dt'] = pd.to_datetime(qsos['datetime_15min'], format='%Y-%m-%d %H:%M:%S')
-    
     # Count QSOs per 15-minute interval by band and mode
-    interval_counts = qsos.groupby(['dt', 'band', 'mode_clean']).size().reset_index(name='count')
+    interval_counts = load_band_intervals(db_path)
     
     # Create separate charts for each band
     bands = ['160m', '80m', '40m', '20m', '15m', '10m', 'VHF+']
@@ -280,8 +245,8 @@ def create_band_activity_chart(meta_db, qso_db, output_dir):
             plt.legend()
             
             # Set x-axis limits to contest period (14:00 to 02:00 = 12 hours)
-            contest_start = pivot_data.index.min().replace(hour=14, minute=0, second=0)
-            contest_end = contest_start + pd.Timedelta(hours=12)  # Exactly 12 hours later (02:00 next day)
+            contest_start = pd.Timestamp(CONTEST_START)
+            contest_end = contest_start + pd.Timedelta(minutes=CONTEST_MINUTES)  # 02:00 next day
             plt.xlim(contest_start, contest_end)
             
             # Format x-axis to show only HH:MM times
@@ -293,7 +258,7 @@ def create_band_activity_chart(meta_db, qso_db, output_dir):
             
             # Save individual band chart
             safe_band = band.replace('+', 'Plus')
-            plt.savefig(output_dir / f'NYQP_2025_{safe_band}_Activity.png', dpi=150, bbox_inches='tight')
+            plt.savefig(output_dir / f'{CHART_PREFIX}_{safe_band}_Activity.png', dpi=150, bbox_inches='tight')
             plt.close()
             
             print(f"Created {band} activity chart")
@@ -302,49 +267,12 @@ def create_band_activity_chart(meta_db, qso_db, output_dir):
     
     print("Created all band activity charts")
 
-def create_stacked_band_charts(meta_db, qso_db, output_dir):
+def create_stacked_band_charts(db_path, output_dir):
     """Create stacked area charts showing all bands by mode (CW and PH)."""
     
-    # Get QSO data with time and band info
-    qso_conn = sqlite3.connect(qso_db)
-    qsos = pd.read_sql_query("""
-        SELECT DISTINCT station_call, freq, mode, date, time
-        FROM qsos
-        ORDER BY date, time
-    """, qso_conn)
-    qso_conn.close()
-    
-    # Convert frequency to band
-    def freq_to_band(freq_str):
-        try:
-            freq = int(freq_str)
-            if 1800 <= freq <= 2000: return '160m'
-            elif 3500 <= freq <= 4000: return '80m'
-            elif 7000 <= freq <= 7300: return '40m'
-            elif 14000 <= freq <= 14350: return '20m'
-            elif 21000 <= freq <= 21450: return '15m'
-            elif 28000 <= freq <= 29700: return '10m'
-            else: return 'VHF+'
-        except:
-            return 'Unknown'
-    
-    qsos['band'] = qsos['freq'].apply(freq_to_band)
-    qsos['mode_clean'] = qsos['mode'].apply(lambda x: 'CW' if x == 'CW' else 'PH')
-    
-    # Create 15-minute intervals from date and time
-    qsos['time_minutes'] = qsos['time'].str[:2].astype(int) * 60 + qsos['time'].str[2:4].astype(int)
-    qsos['time_15min'] = (qsos['time_minutes'] // 15) * 15
-    qsos['hour_15min'] = qsos['time_15min'] // 60
-    qsos['min_15min'] = qsos['time_15min'] % 60
-    qsos['time_str'] = qsos['hour_15min'].astype(str).str.zfill(2) + ':' + qsos['min_15min'].astype(str).str.zfill(2) + ':00'
-    qsos['datetime_15min'] = qsos['date'] + ' ' + qsos['time_str']
-    qsos['dt'] = pd.to_datetime(qsos['datetime_15min'], format='%Y-%m-%d %H:%M:%S')
-    
-    # Filter out VHF+
-    qsos = qsos[qsos['band'] != 'VHF+']
-    
-    # Count QSOs per 15-minute interval by band and mode
-    interval_counts = qsos.groupby(['dt', 'band', 'mode_clean']).size().reset_index(name='count')
+    # Count QSOs per 15-minute interval by band and mode, without VHF+
+    interval_counts = load_band_intervals(db_path)
+    interval_counts = interval_counts[interval_counts['band'] != 'VHF+']
     
     # Band order (160m on bottom, 10m on top) and colors
     bands = ['160m', '80m', '40m', '20m', '15m', '10m']
@@ -381,8 +309,8 @@ def create_stacked_band_charts(meta_db, qso_db, output_dir):
             plt.grid(True, alpha=0.3)
             
             # Set x-axis limits to contest period (14:00 to 02:00 = 12 hours)
-            contest_start = pivot_data.index.min().replace(hour=14, minute=0, second=0)
-            contest_end = contest_start + pd.Timedelta(hours=12)
+            contest_start = pd.Timestamp(CONTEST_START)
+            contest_end = contest_start + pd.Timedelta(minutes=CONTEST_MINUTES)
             plt.xlim(contest_start, contest_end)
             
             # Format x-axis to show only HH:MM times
@@ -393,7 +321,7 @@ def create_stacked_band_charts(meta_db, qso_db, output_dir):
             plt.tight_layout()
             
             # Save chart
-            plt.savefig(output_dir / f'NYQP_2025_AllBands_{mode}_Activity.png', dpi=150, bbox_inches='tight')
+            plt.savefig(output_dir / f'{CHART_PREFIX}_AllBands_{mode}_Activity.png', dpi=150, bbox_inches='tight')
             plt.close()
             
             print(f"Created stacked {mode} band activity chart")
@@ -402,5 +330,34 @@ def create_stacked_band_charts(meta_db, qso_db, output_dir):
     
     print("Created stacked band activity charts")
 
+def create_year_comparison_chart(output_dir, years=None):
+    """Plot QSOs per contest hour for every year in the contest store."""
+    
+    years = available_years() if years is None else years
+    if len(years) < 2:
+        print("Only one contest year built; skipping year comparison chart")
+        # Don't leave a comparison from when more years were built
+        (output_dir / YEAR_COMPARISON_CHART).unlink(missing_ok=True)
+        return
+    
+    with ContestStore(years) as store:
+        hourly = pd.DataFrame(store.qsos_per_hour(CONTEST_MINUTES), columns=['year', 'hour', 'qsos'])
+    
+    plt.figure(figsize=(12, 6))
+    for year, year_data in hourly.groupby('year'):
+        plt.plot(year_data['hour'], year_data['qsos'], marker='o', linewidth=2, label=str(year))
+    
+    plt.title('QSOs per Contest Hour by Year', fontsize=16)
+    plt.xlabel('Hour of Contest (from 14:00 UTC)', fontsize=12)
+    plt.ylabel('QSOs (excluding dupes)', fontsize=12)
+    plt.xticks(range(CONTEST_MINUTES // 60))
+    plt.grid(True, alpha=0.3)
+    plt.legend()
+    plt.tight_layout()
+    
+    plt.savefig(output_dir / YEAR_COMPARISON_CHART, dpi=150, bbox_inches='tight')
+    plt.close()
+    print("Created year comparison chart")
+
 if __name__ == '__main__':
     create_charts()
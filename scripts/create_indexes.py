@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Build indexes on the contest database and report how consumer queries change.
+Run after create_sql_db.py (which also calls index_database() at the end of
+every build, analyzing in full only after a fresh build); run standalone
+with --rebuild to see before/after query plans.
+"""
+
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+
+from paths import CONTEST_DB
+
+# Indexes on contest.db, named for the access pattern they serve.
+# idx_qsos_log_file_track also serves the per-log deletes of incremental
+# rebuilds, and covers every column the mobile-track queries read.
+INDEXES = {
+    'idx_qsos_log_file_track': 'qsos(log_file, datetime, tx_county, station_call, minute)',
+    'idx_qsos_station_id': 'qsos(station_id)',
+    'idx_qsos_rx_county': 'qsos(rx_county)',
+    'idx_qsos_dup_minute_band': 'qsos(is_dup, minute, band, mode_class)',
+    'idx_stations_location': 'stations(location)',
+    'idx_stations_station_type': 'stations(station_type, log_file)',
+    'idx_stations_call_id': 'stations(call_id, location)',
+}
+
+# Superseded by idx_qsos_log_file_track and idx_qsos_station_id, and (for the
+# county map) by the call_counts summary table
+OBSOLETE_INDEXES = ['idx_qsos_log_file', 'idx_qsos_log_file_datetime', 'idx_qsos_station_call',
+                    'idx_qsos_tx_county_call']
+
+# Queries issued by the generator scripts: (consumer, sql, params)
+CONSUMER_QUERIES = [
+    ('summary_tables: one station\'s interval counts', """
+        SELECT minute / 15, band, mode_class, COUNT(*)
+        FROM qsos
+        WHERE is_dup = 0 AND minute >= 0 AND minute < 720 AND band IS NOT NULL
+              AND station_id IN (?)
+        GROUP BY minute / 15, band, mode_class
+    """, (1,)),
+    ('leaderboard: one county\'s top 5', """
+        SELECT rank, call, value
+        FROM leaderboard
+        WHERE board = ? AND key = ? AND rank <= ?
+        ORDER BY rank
+    """, ('county', 'ALB', 5)),
+    ('ContestStore.qsos_per_hour: one year\'s arm of the year comparison', """
+        SELECT minute / 60 AS hour, COUNT(*)
+        FROM qsos
+        WHERE is_dup = 0 AND minute >= 0 AND minute < ?
+        GROUP BY hour
+    """, (720,)),
+    ('get_mobile_stations_from_db: mobile logs and callsigns', """
+        SELECT s.log_file,
+               (SELECT q.station_call FROM qsos q WHERE q.log_file = s.log_file LIMIT 1)
+        FROM stations s
+        WHERE s.station_type = 'MOBILE'
+    """, ()),
+    ('load_database_data: QSOs per worked county', """
+        SELECT rx_county, COUNT(*) as qsos
+        FROM qsos
+        WHERE rx_county IN (?, ?, ?)
+        GROUP BY rx_county
+    """, ('ALB', 'ERI', 'MON')),
+    ('load_database_data: mobile QSOs', """
+        SELECT station_call, minute, tx_county
+        FROM qsos
+        WHERE log_file IN (?, ?) AND tx_county IN (?, ?, ?) AND minute IS NOT NULL
+        ORDER BY station_call, datetime
+    """, ('k2a.log', 'n2t.log', 'ALB', 'ERI', 'MON')),
+    ('load_reference_data: mobile track', """
+        SELECT minute, tx_county
+        FROM qsos
+        WHERE log_file = ? AND minute IS NOT NULL
+        ORDER BY datetime
+    """, ('k2a.log',)),
+]
+
+def create_indexes(conn, indexes):
+    """Create any missing indexes from a {name: 'table(columns)'} mapping."""
+    for name, target in indexes.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+
+def drop_indexes(conn, names):
+    for name in names:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+
+def index_database(conn, full=True):
+    """Post-ingest stage: build all indexes and refresh planner statistics.
+
+    full=True re-analyzes the whole database, for a fresh build; otherwise
+    PRAGMA optimize only re-analyzes tables whose statistics have gone stale,
+    so a small incremental update doesn't pay for a statistics pass over
+    every table. A database without statistics is always analyzed in full.
+    """
+    drop_indexes(conn, OBSOLETE_INDEXES)
+    create_indexes(conn, INDEXES)
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").fetchone()
+    if full or not has_stats:
+        conn.execute('ANALYZE')
+    else:
+        conn.execute('PRAGMA optimize')
+    conn.commit()
+
+def query_plan(conn, sql, params):
+    """Return EXPLAIN QUERY PLAN output as a list of detail strings."""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+def time_query(conn, sql, params, repeat=3):
+    """Best-of-N wall time in milliseconds for fetching every row."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def profile_queries(conn):
+    """Plan and time every consumer query; returns {consumer: (plan, ms)}."""
+    results = {}
+    for consumer, sql, params in CONSUMER_QUERIES:
+        results[consumer] = (query_plan(conn, sql, params), time_query(conn, sql, params))
+    return results
+
+def print_report(before, after):
+    for consumer, (plan_before, ms_before) in before.items():
+        plan_after, ms_after = after[consumer]
+        print(f"\n{consumer}")
+        if plan_before == plan_after:
+            print(f"  plan unchanged: {'; '.join(plan_after)}")
+        else:
+            print(f"  before: {'; '.join(plan_before)}")
+            print(f"  after:  {'; '.join(plan_after)}")
+        print(f"  time: {ms_before:.2f} ms -> {ms_after:.2f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Index the contest database and report query plans.')
+    parser.add_argument('--db', default=CONTEST_DB, type=Path)
+    parser.add_argument('--rebuild', action='store_true',
+                        help='drop the indexes first so the report compares against an unindexed database')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if args.rebuild:
+        drop_indexes(conn, list(INDEXES) + OBSOLETE_INDEXES)
+        conn.execute('DROP TABLE IF EXISTS sqlite_stat1')
+
+    before = profile_queries(conn)
+    index_database(conn, full=args.rebuild)
+    after = profile_queries(conn)
+    print_report(before, after)
+
+    conn.close()
@@ -1,28 +1,285 @@
 #!/usr/bin/env python3
 """
-Create SQL databases from NYQP log files.
-Two databases: contest_meta.db (station info/categories) and contest_qsos.db (QSO data)
+Create the SQL database from NYQP log files.
+One database, contest.db, holds station info/categories (stations), QSO
+data (qsos, with station_call referencing stations.callsign) and the
+callsigns dictionary that both refer to by integer id, plus the summary
+tables of QSO counts read by the stats, map and charts (summary_tables.py).
+Each station's computed score is stored with its row (scoring.py), and
+ranked leaderboards are rebuilt for whatever an ingest changed (leaderboards.py).
+Per-station QSO rates are kept in station_rates and station_buckets (rates.py).
+
+Rebuilds are incremental: a log_manifest table records each log's size,
+mtime and content hash, and only new or changed logs are re-parsed. Use
+--full to rebuild the database from scratch.
+
+Logs are read from a directory of *.log files and/or .zip, .tar.gz and
+.log.gz archives in it (see log_sources.py); nothing is extracted to disk.
 """
 
+import argparse
+import hashlib
+import io
+import os
 import sqlite3
 import re
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from multiprocessing import Pool
 from pathlib import Path
-from datetime import datetime
+from itertools import chain, islice
+
+from create_indexes import index_database
+from leaderboards import LeaderboardDeltas, create_leaderboard_table, refresh_leaderboards
+from log_sources import iter_contents, list_sources
+from qso_record import QSO
+from rates import create_rate_tables, update_rates
+from scoring import create_multipliers_table, score_stations
+from summary_tables import CONTEST_MINUTES, SummaryDeltas, apply_station_deltas, create_summary_tables
+from paths import CONTEST_DB, CONTEST_YEAR, LOGS_DIR
+
+def contest_start(year):
+    """The NYQP starts at 14:00 UTC on the third Saturday of October."""
+    first = datetime(year, 10, 1, 14, 0)
+    return first + timedelta(days=(5 - first.weekday()) % 7 + 14)
+
+# Start of the contest period (UTC); its length is CONTEST_MINUTES (defined
+# with the summary tables, which bucket it). qsos.minute counts minutes from
+# CONTEST_START so consumers never re-parse date/time strings, and lines up
+# the hours of different years' contests
+CONTEST_START = contest_start(CONTEST_YEAR)
+
+# Band codes stored in qsos.band: (code, name, low kHz, high kHz).
+# Any other integer frequency is BAND_VHF; unparseable ones are NULL.
+BANDS = [
+    (0, '160m', 1800, 2000),
+    (1, '80m', 3500, 4000),
+    (2, '40m', 7000, 7300),
+    (3, '20m', 14000, 14350),
+    (4, '15m', 21000, 21450),
+    (5, '10m', 28000, 29700),
+]
+BAND_VHF = 6
+BAND_NAMES = {code: name for code, name, _, _ in BANDS}
+BAND_NAMES[BAND_VHF] = 'VHF+'
+
+# Cabrillo mode designators grouped into the classes stored in qsos.mode_class
+MODE_CLASSES = {
+    'CW': 'CW',
+    'PH': 'PH', 'SSB': 'PH', 'USB': 'PH', 'LSB': 'PH', 'FM': 'PH', 'AM': 'PH',
+    'RY': 'DIG', 'RTTY': 'DIG', 'DG': 'DIG', 'DIG': 'DIG', 'FT8': 'DIG', 'FT4': 'DIG', 'PSK': 'DIG',
+}
+
+# Bumped whenever the table layout changes; an older database is rebuilt
+# in full instead of updated incrementally
+SCHEMA_VERSION = 12
+
+# Column order of the rows produced by qso_rows(), followed by the
+# callsigns ids the writer appends to each row (add_call_ids())
+QSO_COLUMNS = (
+    'station_call', 'freq', 'mode', 'date', 'time', 'datetime',
+    'tx_call', 'tx_rst', 'tx_county', 'rx_call', 'rx_rst', 'rx_county', 'log_file',
+    'freq_khz', 'band', 'mode_class', 'minute',
+    'station_id', 'tx_call_id', 'rx_call_id',
+)
+
+# Columns that identify one logged contact; the first row (lowest id) of each
+# key is the unique copy, later rows are flagged with qsos.is_dup = 1.
+# The call ids map one-to-one onto the calls as logged, so this is the same
+# key as the station_call/tx_call/rx_call text, compared as integers.
+DEDUP_KEY = ('station_id', 'datetime', 'freq', 'mode', 'tx_call_id', 'rx_call_id')
+
+# Portable/mobile designators that do not change who the station is
+PORTABLE_SUFFIXES = ('/MM', '/AM', '/QRP', '/M', '/P', '-M', '-P')
+# Mobile designators removed from the sending call (qsos.tx_call) at ingest
+MOBILE_SUFFIXES = ('/M', '-M')
+
+def strip_suffix(call, suffixes=PORTABLE_SUFFIXES):
+    """Strip one of the given suffixes from the end of a callsign."""
+    for suffix in suffixes:
+        if call.endswith(suffix) and len(call) > len(suffix):
+            return call[:-len(suffix)]
+    return call
+
+def base_call(call):
+    """Upper-case a callsign and strip one portable/mobile suffix."""
+    return strip_suffix(call.strip().upper())
+
+def band_code(freq_khz):
+    """Map an integer frequency in kHz to its band code (None if unknown)."""
+    if freq_khz is None:
+        return None
+    for code, _, low, high in BANDS:
+        if low <= freq_khz <= high:
+            return code
+    return BAND_VHF
+
+def freq_fields(freq):
+    """Return (freq, freq_khz, band) for a Cabrillo frequency field."""
+    try:
+        freq_khz = int(freq)
+    except ValueError:
+        freq_khz = None
+    return freq, freq_khz, band_code(freq_khz)
+
+def mode_fields(mode):
+    """Return (mode, mode_class) for a Cabrillo mode field."""
+    return mode, MODE_CLASSES.get(mode.upper(), 'PH')
+
+# Bytes that make a log decode or split differently as ASCII str than it
+# does through TextIOWrapper with errors='ignore': non-ASCII bytes (dropped
+# or multi-byte), \x0b/\x0c (line breaks to str.splitlines) and \x1c-\x1f
+# (line breaks and whitespace to str). Logs containing any of them are
+# parsed by the str parser instead of the fast path.
+SLOW_PATH_BYTES = re.compile(rb'[\x0b\x0c\x1c-\x1f\x80-\xff]')
+
+# One log read and parsed in a single pass; size/mtime are taken when the
+# logs are listed, before the read, so a file that changes mid-read is
+# looked at again next time
+ParsedLog = namedtuple('ParsedLog', 'log_file size mtime sha256 metadata rows')
 
 class NYQPDatabaseCreator:
-    def __init__(self, logs_dir, output_dir):
+    # Cabrillo header tags and the metadata keys they are stored under
+    HEADER_FIELDS = {
+        'callsign': 'callsign',
+        'category': 'category',
+        'category-operator': 'operator_category',
+        'category-station': 'station_type',
+        'category-power': 'power',
+        'category-band': 'band',
+        'category-mode': 'mode',
+        'category-transmitter': 'transmitter_category',
+        'category-overlay': 'overlay',
+        'operators': 'operators',
+        'location': 'location',
+        'club': 'club',
+        'created-by': 'created_by',
+    }
+
+    # Pragmas used while bulk loading a fresh (or in-memory) database:
+    # nothing has to survive a crash mid-build because a failed build is
+    # simply rerun
+    BUILD_PRAGMAS = [
+        'PRAGMA journal_mode = WAL',
+        'PRAGMA synchronous = OFF',
+        'PRAGMA cache_size = -262144',  # 256 MiB
+        'PRAGMA temp_store = MEMORY',
+    ]
+    # An in-place update of the live database keeps full durability and
+    # the rollback journal; only the caches are enlarged
+    UPDATE_PRAGMAS = [
+        'PRAGMA cache_size = -262144',
+        'PRAGMA temp_store = MEMORY',
+    ]
+    # Restored once a fresh load has committed, before readers use the file
+    SAFE_PRAGMAS = [
+        'PRAGMA journal_mode = DELETE',
+        'PRAGMA synchronous = FULL',
+    ]
+
+    def __init__(self, logs_dir, db_path, workers=1, bulk=True, batch_size=5000,
+                 contest_start=CONTEST_START, fast_parse=True, in_memory=False):
         self.logs_dir = Path(logs_dir)
-        self.output_dir = Path(output_dir)
-        
-    def create_meta_db(self):
-        """Create database for station metadata and categories."""
-        db_path = self.output_dir / 'contest_meta.db'
-        # Remove existing database
-        if db_path.exists():
-            db_path.unlink()
-            
-        conn = sqlite3.connect(db_path)
+        self.db_path = Path(db_path)
+        self.contest_start = contest_start
+        # Minutes from contest_start to midnight of each QSO date seen so far
+        self._day_offsets = {}
+        # Number of parser processes; 1 keeps the whole build in this process
+        self.workers = workers
+        # Bulk mode batches inserts and relaxes durability while loading;
+        # bulk=False keeps the original one-INSERT-per-QSO path for timing
+        self.bulk = bulk
+        self.batch_size = batch_size
+        # Parse with the fast path (parse_log_bytes); False uses the str
+        # parser (parse_log_text) for comparison
+        self.fast_parse = fast_parse
+        # Build in an in-memory database and swap the finished file into
+        # place, so readers never see a missing or half-built database
+        self.in_memory = in_memory
+        # {call as logged: callsigns.id}, filled by load_call_ids()
+        self.call_ids = {}
+        self._next_call_id = 1
+        # Whether open_db() applied BUILD_PRAGMAS
+        self._relaxed = False
+        
+    def __getstate__(self):
+        # Parser processes get a pickled copy of the creator for every task;
+        # the call ids are only used by the writer, so leave them behind
+        state = self.__dict__.copy()
+        state['call_ids'] = {}
+        return state
+        
+    def open_db(self, fresh=True):
+        """Open the contest database.
+        
+        With fresh=True any existing file is removed first. In in-memory
+        mode the file is left alone: an empty in-memory database is
+        returned, or for an update a copy of the file made with the backup API.
+        """
+        db_path = self.db_path
+        if self.in_memory:
+            conn = sqlite3.connect(':memory:')
+            if not fresh and db_path.exists():
+                source = sqlite3.connect(f'{db_path.resolve().as_uri()}?mode=ro', uri=True)
+                source.backup(conn)
+                source.close()
+        else:
+            # Remove existing database
+            if fresh and db_path.exists():
+                db_path.unlink()
+            conn = sqlite3.connect(db_path)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        # Durability is only relaxed when a crash cannot damage a file a
+        # later run would update in place
+        self._relaxed = self.bulk and (fresh or self.in_memory)
+        if self._relaxed:
+            for pragma in self.BUILD_PRAGMAS:
+                conn.execute(pragma)
+        elif self.bulk:
+            for pragma in self.UPDATE_PRAGMAS:
+                conn.execute(pragma)
+        return conn
+        
+    def close_db(self, conn, changed=True):
+        """Commit, restore safe settings after a bulk load, and close.
+        
+        An in-memory build is written to disk here instead: the backup API
+        copies it to a temporary file next to the database, which then
+        replaces the database in one rename. With changed=False (an update
+        that loaded and removed nothing) the file is left as it was, so its
+        content hash doesn't make the pipeline re-run every stage after it.
+        """
+        conn.commit()
+        if self.in_memory:
+            if changed:
+                self.write_db(conn)
+            conn.close()
+            return
+        if self._relaxed:
+            for pragma in self.SAFE_PRAGMAS:
+                conn.execute(pragma)
+        conn.close()
+        
+    def write_db(self, conn):
+        """Back up conn to a temporary file and atomically rename it over db_path."""
+        fd, tmp_name = tempfile.mkstemp(dir=self.db_path.parent, prefix=f'.{self.db_path.name}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            # mkstemp creates the file owner-only; keep the database's usual permissions
+            os.chmod(tmp_name, self.db_path.stat().st_mode if self.db_path.exists() else 0o644)
+            target = sqlite3.connect(tmp_name)
+            try:
+                conn.backup(target)
+            finally:
+                target.close()
+            os.replace(tmp_name, self.db_path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
         
+    def create_stations_table(self, conn):
         conn.execute('''
             CREATE TABLE IF NOT EXISTS stations (
                 callsign TEXT PRIMARY KEY,
@@ -39,52 +296,57 @@ class NYQPDatabaseCreator:
                 location TEXT,
                 club TEXT,
                 created_by TEXT,
-                log_file TEXT
+                log_file TEXT,
+                call_id INTEGER REFERENCES callsigns(id),
+                computed_points INTEGER NOT NULL DEFAULT 0,
+                computed_mults INTEGER NOT NULL DEFAULT 0,
+                computed_score INTEGER NOT NULL DEFAULT 0
             )
         ''')
         
-        for log_file in self.logs_dir.glob('*.log'):
-            metadata = self.parse_metadata(log_file)
-            # Use CALLSIGN from header if available, otherwise fall back to filename
-            callsign = metadata.get('callsign', log_file.stem.upper())
-            
-            conn.execute('''
-                INSERT OR REPLACE INTO stations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                callsign,
-                metadata.get('category'),
-                metadata.get('operator_category'),
-                metadata.get('station_type'),
-                metadata.get('transmitter_category'),
-                metadata.get('power'),
-                metadata.get('band'),
-                metadata.get('mode'),
-                metadata.get('overlay'),
-                metadata.get('claimed_score'),
-                metadata.get('operators'),
-                metadata.get('location'),
-                metadata.get('club'),
-                metadata.get('created_by'),
-                log_file.name
-            ))
+    def create_callsigns_table(self, conn):
+        """Every distinct call in the database, as logged.
         
-        conn.commit()
-        conn.close()
-        print(f"Created {db_path}")
-        
-    def create_qso_db(self):
-        """Create database for QSO data."""
-        db_path = self.output_dir / 'contest_qsos.db'
-        # Remove existing database
-        if db_path.exists():
-            db_path.unlink()
-            
-        conn = sqlite3.connect(db_path)
+        base_id is the id of the call's normalized form (base_call(): upper
+        case, one portable/mobile suffix stripped); a call already in that
+        form is its own base. qsos and stations refer to calls by id.
+        """
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS callsigns (
+                id INTEGER PRIMARY KEY,
+                call TEXT UNIQUE NOT NULL,
+                base_id INTEGER NOT NULL REFERENCES callsigns(id)
+            )
+        ''')
+        
+    def load_call_ids(self, conn):
+        self.call_ids = dict(conn.execute('SELECT call, id FROM callsigns'))
+        self._next_call_id = max(self.call_ids.values(), default=0) + 1
+        
+    def call_id(self, conn, call):
+        """Return the callsigns id of a call, adding it (and its base form) if new."""
+        call_id = self.call_ids.get(call)
+        if call_id is None:
+            call_id = self.call_ids[call] = self._next_call_id
+            self._next_call_id += 1
+            base = base_call(call)
+            base_id = call_id if base == call else self.call_id(conn, base)
+            conn.execute('INSERT INTO callsigns VALUES (?, ?, ?)', (call_id, call, base_id))
+        return call_id
         
+    def add_call_ids(self, conn, rows):
+        """Append station_id, tx_call_id and rx_call_id to parsed qsos rows."""
+        ids = self.call_ids
+        for row in rows:
+            yield row + (ids.get(row[0]) or self.call_id(conn, row[0]),
+                         ids.get(row[6]) or self.call_id(conn, row[6]),
+                         ids.get(row[9]) or self.call_id(conn, row[9]))
+        
+    def create_qsos_table(self, conn):
         conn.execute('''
             CREATE TABLE IF NOT EXISTS qsos (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                station_call TEXT,
+                station_call TEXT REFERENCES stations(callsign),
                 freq TEXT,
                 mode TEXT,
                 date TEXT,
@@ -96,125 +358,511 @@ class NYQPDatabaseCreator:
                 rx_call TEXT,
                 rx_rst TEXT,
                 rx_county TEXT,
-                log_file TEXT
+                log_file TEXT,
+                freq_khz INTEGER,
+                band INTEGER,
+                mode_class TEXT,
+                minute INTEGER,
+                station_id INTEGER REFERENCES callsigns(id),
+                tx_call_id INTEGER REFERENCES callsigns(id),
+                rx_call_id INTEGER REFERENCES callsigns(id),
+                is_dup INTEGER NOT NULL DEFAULT 1,
+                match_id INTEGER,
+                match_status TEXT
             )
         ''')
+        # New rows start flagged as duplicates and refresh_duplicates() clears
+        # the flag on the first copy of each contact, so the unique index
+        # (which only holds is_dup = 0 rows) is never violated mid-load
+        conn.execute(f'''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_qsos_unique
+            ON qsos({', '.join(DEDUP_KEY)}) WHERE is_dup = 0
+        ''')
+        conn.execute('CREATE VIEW IF NOT EXISTS qsos_unique AS SELECT * FROM qsos WHERE is_dup = 0')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bands (
+                code INTEGER PRIMARY KEY,
+                name TEXT,
+                low_khz INTEGER,
+                high_khz INTEGER
+            )
+        ''')
+        conn.executemany('INSERT OR REPLACE INTO bands VALUES (?, ?, ?, ?)',
+                         BANDS + [(BAND_VHF, BAND_NAMES[BAND_VHF], None, None)])
+        
+    def create_manifest_table(self, conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS log_manifest (
+                log_file TEXT PRIMARY KEY,
+                path TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                sha256 TEXT,
+                call_id INTEGER REFERENCES callsigns(id)
+            )
+        ''')
+        
+    def load_manifest(self):
+        """Return {log_file: (size, mtime_ns, sha256)} from the last build.
+        
+        Returns None when there is nothing to update incrementally (no
+        database yet, or one built with a different schema version).
+        """
+        if not self.db_path.exists():
+            return None
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                return None
+            rows = conn.execute('SELECT log_file, size, mtime_ns, sha256 FROM log_manifest').fetchall()
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            conn.close()
+        return {row[0]: row[1:] for row in rows}
+        
+    def update_manifest(self, conn, parsed):
+        call_id = self.call_id(conn, self.station_callsign(parsed.log_file, parsed.metadata))
+        conn.execute('''
+            INSERT OR REPLACE INTO log_manifest VALUES (?, ?, ?, ?, ?, ?)
+        ''', (parsed.log_file.name, str(parsed.log_file), parsed.size, parsed.mtime, parsed.sha256, call_id))
         
-        for log_file in self.logs_dir.glob('*.log'):
-            metadata = self.parse_metadata(log_file)
-            # Use CALLSIGN from header if available, otherwise fall back to filename
-            station_call = metadata.get('callsign', log_file.stem.upper())
+    def station_logs(self, conn, station_ids):
+        """Names of the logs (per the manifest) sent in under the given station ids."""
+        station_ids = sorted(station_ids)
+        marks = ', '.join('?' * len(station_ids))
+        return {row[0] for row in conn.execute(
+            f'SELECT log_file FROM log_manifest WHERE call_id IN ({marks})', station_ids)}
+        
+    def log_station_ids(self, conn, log_name):
+        """Station ids of one log's QSOs and of its stations row (a log may have no QSOs)."""
+        return {row[0] for row in conn.execute('''
+            SELECT DISTINCT station_id FROM qsos WHERE log_file = ?
+            UNION SELECT call_id FROM stations WHERE log_file = ?
+        ''', (log_name, log_name))}
+        
+    def delete_log(self, conn, log_name):
+        """Remove every row that came from one log file.
+        
+        Returns the station ids whose QSOs were removed.
+        """
+        station_ids = self.log_station_ids(conn, log_name)
+        conn.execute('DELETE FROM qsos WHERE log_file = ?', (log_name,))
+        conn.execute('DELETE FROM stations WHERE log_file = ?', (log_name,))
+        conn.execute('DELETE FROM log_manifest WHERE log_file = ?', (log_name,))
+        return station_ids
+        
+    def refresh_duplicates(self, conn, station_ids=None):
+        """Recompute qsos.is_dup for the given station ids (all stations if None).
+        
+        Duplicates never span station callsigns, so only stations whose logs
+        were added, changed or removed need to be looked at again.
+        """
+        key = ', '.join(DEDUP_KEY[1:])
+        if station_ids is None:
+            conn.execute('UPDATE qsos SET is_dup = 1 WHERE is_dup = 0')
+            conn.execute(f'''
+                UPDATE qsos SET is_dup = 0
+                WHERE id IN (SELECT MIN(id) FROM qsos GROUP BY station_id, {key})
+            ''')
+            return
+        
+        for station_id in station_ids:
+            conn.execute('UPDATE qsos SET is_dup = 1 WHERE station_id = ? AND is_dup = 0', (station_id,))
+            conn.execute(f'''
+                UPDATE qsos SET is_dup = 0
+                WHERE id IN (SELECT MIN(id) FROM qsos WHERE station_id = ? GROUP BY {key})
+            ''', (station_id,))
+        
+    def station_callsign(self, log_file, metadata):
+        """Use CALLSIGN from header if available, otherwise fall back to filename."""
+        return metadata.get('callsign', log_file.stem.upper())
+        
+    def insert_station(self, conn, log_file, metadata):
+        """Insert one station row from parsed header metadata."""
+        callsign = self.station_callsign(log_file, metadata)
+        
+        conn.execute('''
+            INSERT OR REPLACE INTO stations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 0)
+        ''', (
+            callsign,
+            metadata.get('category'),
+            metadata.get('operator_category'),
+            metadata.get('station_type'),
+            metadata.get('transmitter_category'),
+            metadata.get('power'),
+            metadata.get('band'),
+            metadata.get('mode'),
+            metadata.get('overlay'),
+            metadata.get('claimed_score'),
+            metadata.get('operators'),
+            metadata.get('location'),
+            metadata.get('club'),
+            metadata.get('created_by'),
+            log_file.name,
+            self.call_id(conn, callsign)
+        ))
+        
+    def qso_rows(self, log_file, metadata, qsos):
+        """Yield qsos table rows (without id) for every QSO of one log."""
+        station_call = self.station_callsign(log_file, metadata)
+        
+        for qso in qsos:
+            yield self.qso_row(station_call, log_file.name,
+                               qso.freq, qso.mode, qso.date, qso.time,
+                               qso.tx_call, qso.tx_rst, qso.tx_county,
+                               qso.rx_call, qso.rx_rst, qso.rx_county)
+        
+    def qso_row(self, station_call, log_name, freq, mode, date, time_str,
+                tx_call, tx_rst, tx_county, rx_call, rx_rst, rx_county):
+        """Build one qsos table row (in QSO_COLUMNS order) from parsed fields."""
+        freq, freq_khz, band = freq_fields(freq)
+        mode, mode_class = mode_fields(mode)
+        date, time_str, dt_str, minute = self.time_fields(date, time_str)
+        return (
+            station_call, freq, mode, date, time_str, dt_str,
+            tx_call, tx_rst, tx_county, rx_call, rx_rst, rx_county,
+            log_name, freq_khz, band, mode_class, minute
+        )
+        
+    def time_fields(self, date, time_str):
+        """Return (date, time, datetime, minute) for a QSO's date and time fields."""
+        # Create datetime for sorting/filtering
+        dt_str = f"{date} {time_str[:2]}:{time_str[2:4]}:00"
+        return date, time_str, dt_str, self.contest_minute(date, time_str)
+        
+    def contest_minute(self, date, time_str):
+        """Minutes from contest start for a Cabrillo date and HHMM time (None if malformed)."""
+        day_offset = self._day_offsets.get(date)
+        if day_offset is None:
+            try:
+                day = datetime.strptime(date, '%Y-%m-%d')
+            except ValueError:
+                return None
+            day_offset = int((day - self.contest_start).total_seconds()) // 60
+            self._day_offsets[date] = day_offset
+        try:
+            return day_offset + int(time_str[:2]) * 60 + int(time_str[2:4])
+        except ValueError:
+            return None
+        
+    def insert_qso_rows(self, conn, rows):
+        """Insert prepared qsos rows, in executemany batches when in bulk mode."""
+        sql = f"INSERT INTO qsos ({', '.join(QSO_COLUMNS)}) VALUES ({', '.join('?' * len(QSO_COLUMNS))})"
+        rows = iter(rows)
+        if self.bulk:
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                conn.executemany(sql, batch)
+        else:
+            for row in rows:
+                conn.execute(sql, row)
+        
+    def log_files(self):
+        """List the logs to ingest as LogSources, in the order both build modes use."""
+        return list_sources(self.logs_dir)
+        
+    def parse_log(self, item):
+        """Hash and parse one (LogSource, contents) pair into a ParsedLog.
+        
+        Runs in the worker processes of a parallel build, so everything it
+        returns must be picklable.
+        """
+        log_file, raw = item
+        if self.fast_parse:
+            metadata, rows = self.parse_log_bytes(log_file, raw)
+        else:
+            metadata, rows = self.parse_log_text(log_file, raw)
+        return ParsedLog(log_file, log_file.size, log_file.mtime_ns,
+                         hashlib.sha256(raw).hexdigest(), metadata, rows)
+        
+    def parse_log_text(self, log_file, raw):
+        """Parse a whole log with the str parser into (metadata, rows)."""
+        with io.TextIOWrapper(io.BytesIO(raw), encoding='utf-8', errors='ignore') as f:
+            metadata, first_qso = self.read_header(f)
+            rows = list(self.qso_rows(log_file, metadata, self.iter_qsos(f, first_qso)))
+        return metadata, rows
+        
+    def parse_log_bytes(self, log_file, raw):
+        """Parse a whole log held as bytes into (metadata, rows).
+        
+        Gives the same result as parse_log_text(). A log without
+        SLOW_PATH_BYTES is decoded as ASCII in one call and each QSO line is
+        split straight into a row tuple, with no TextIOWrapper and no dict
+        per QSO. Field values repeat heavily within a log, so the derived
+        columns are computed once per distinct field and looked up after
+        that. Other logs go through parse_log_text().
+        """
+        if SLOW_PATH_BYTES.search(raw):
+            return self.parse_log_text(log_file, raw)
+        
+        lines = raw.decode('ascii').splitlines()
+        metadata = {}
+        first_qso = len(lines)
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped.startswith('QSO:'):
+                first_qso = i
+                break
+            self.parse_header_line(metadata, stripped)
+        
+        station_call = self.station_callsign(log_file, metadata)
+        log_name = log_file.name
+        tx_calls = {}   # tx call -> tx call with a /M or -M suffix stripped
+        freqs = {}      # freq -> freq_fields()
+        modes = {}      # mode -> mode_fields()
+        times = {}      # (date, time) -> time_fields()
+        rows = []
+        for line in islice(lines, first_qso, None):
+            if not line.startswith('QSO:'):
+                continue
+            parts = line.split()
+            if len(parts) < 11:
+                continue
+            _, freq, mode, date, time_str, tx_call, tx_rst, tx_county, rx_call, rx_rst, rx_county = parts[:11]
             
-            with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    if line.startswith('QSO:'):
-                        qso = self.parse_qso_line(line)
-                        if qso:
-                            # Create datetime for sorting/filtering
-                            dt_str = f"{qso['date']} {qso['time'][:2]}:{qso['time'][2:4]}:00"
-                            
-                            conn.execute('''
-                                INSERT INTO qsos VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                station_call,
-                                qso['freq'],
-                                qso['mode'],
-                                qso['date'],
-                                qso['time'],
-                                dt_str,
-                                qso['tx_call'],
-                                qso['tx_rst'],
-                                qso['tx_county'],
-                                qso['rx_call'],
-                                qso['rx_rst'],
-                                qso['rx_county'],
-                                log_file.name
-                            ))
+            freq = freqs.get(freq) or freqs.setdefault(freq, freq_fields(freq))
+            mode = modes.get(mode) or modes.setdefault(mode, mode_fields(mode))
+            when = times.get((date, time_str)) or times.setdefault(
+                (date, time_str), self.time_fields(date, time_str))
+            tx_call = tx_calls.get(tx_call) or tx_calls.setdefault(tx_call, strip_suffix(tx_call, MOBILE_SUFFIXES))
+            
+            rows.append((station_call, freq[0], mode[0], when[0], when[1], when[2],
+                         tx_call, tx_rst, tx_county, rx_call, rx_rst, rx_county,
+                         log_name, freq[1], freq[2], mode[1], when[3]))
+        return metadata, rows
         
-        conn.commit()
-        conn.close()
-        print(f"Created {db_path}")
+    def iter_parsed_logs(self, log_files):
+        """Yield parse_log() results in the given order.
+        
+        Contents are read (and decompressed) in this process, one pass per
+        archive, and parsed in a process pool when there is more than one
+        worker. Work is handed out a window at a time so only a few logs'
+        contents are held in memory; imap keeps the order, so row ids match
+        a serial build.
+        """
+        contents = iter_contents(log_files)
+        if self.workers > 1 and len(log_files) > 1:
+            with Pool(self.workers) as pool:
+                while window := list(islice(contents, self.workers * 8)):
+                    yield from pool.imap(self.parse_log, window, chunksize=4)
+        else:
+            yield from map(self.parse_log, contents)
         
-    def parse_metadata(self, log_file):
-        """Extract metadata from log file header."""
+    def read_header(self, f):
+        """Read header lines from an open log.
+        
+        Returns the metadata dict and the line that ended the header
+        (None if the log has no QSO lines).
+        """
         metadata = {}
         
-        with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith('QSO:'):
-                    break
-                    
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    key = key.strip().lower()
-                    value = value.strip()
-                    
-                    if key == 'category':
-                        metadata['category'] = value
-                    elif key == 'category-operator':
-                        metadata['operator_category'] = value
-                    elif key == 'category-station':
-                        metadata['station_type'] = value
-                    elif key == 'category-power':
-                        metadata['power'] = value
-                    elif key == 'category-band':
-                        metadata['band'] = value
-                    elif key == 'category-mode':
-                        metadata['mode'] = value
-                    elif key == 'category-transmitter':
-                        metadata['transmitter_category'] = value
-                    elif key == 'category-overlay':
-                        metadata['overlay'] = value
-                    elif key == 'claimed-score':
-                        try:
-                            metadata['claimed_score'] = int(value)
-                        except ValueError:
-                            metadata['claimed_score'] = None
-                    elif key == 'operators':
-                        metadata['operators'] = value
-                    elif key == 'location':
-                        metadata['location'] = value
-                    elif key == 'club':
-                        metadata['club'] = value
-                    elif key == 'created-by':
-                        metadata['created_by'] = value
-                    elif key == 'callsign':
-                        metadata['callsign'] = value
-                        
-        return metadata
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith('QSO:'):
+                return metadata, line
+            self.parse_header_line(metadata, stripped)
+            
+        return metadata, None
+        
+    def iter_qsos(self, f, first_qso=None):
+        """Yield parsed QSOs from an open log positioned after its header."""
+        lines = chain([first_qso], f) if first_qso is not None else f
+        for line in lines:
+            if line.startswith('QSO:'):
+                qso = self.parse_qso_line(line)
+                if qso:
+                    yield qso
+        
+    def parse_header_line(self, metadata, line):
+        """Store one stripped header line in metadata if it is a known tag."""
+        if ':' not in line:
+            return
+            
+        key, value = line.split(':', 1)
+        key = key.strip().lower()
+        value = value.strip()
+        
+        if key == 'claimed-score':
+            try:
+                metadata['claimed_score'] = int(value)
+            except ValueError:
+                metadata['claimed_score'] = None
+        elif key in self.HEADER_FIELDS:
+            metadata[self.HEADER_FIELDS[key]] = value
         
     def parse_qso_line(self, line):
-        """Parse Cabrillo QSO line."""
+        """Parse Cabrillo QSO line into a QSO record."""
         parts = line.split()
         if len(parts) < 11:
             return None
             
-        return {
-            'freq': parts[1],
-            'mode': parts[2],
-            'date': parts[3],
-            'time': parts[4],
-            'tx_call': parts[5].rstrip('/M').rstrip('-M'),  # Remove /M and -M suffixes
-            'tx_rst': parts[6],
-            'tx_county': parts[7],
-            'rx_call': parts[8],
-            'rx_rst': parts[9],
-            'rx_county': parts[10]
-        }
-        
-    def create_databases(self):
-        """Create both databases."""
-        self.output_dir.mkdir(exist_ok=True)
-        print("Creating metadata database...")
-        self.create_meta_db()
-        print("Creating QSO database...")
-        self.create_qso_db()
-        print("Done!")
+        return QSO(
+            freq=parts[1],
+            mode=parts[2],
+            date=parts[3],
+            time=parts[4],
+            tx_call=strip_suffix(parts[5], MOBILE_SUFFIXES),  # Remove /M and -M suffixes
+            tx_rst=parts[6],
+            tx_county=parts[7],
+            rx_call=parts[8],
+            rx_rst=parts[9],
+            rx_county=parts[10]
+        )
+        
+    def create_database(self, full=False):
+        """Create or update the database in a single pass over the logs.
+        
+        Unless full is set, an existing build is updated in place: logs whose
+        size and mtime match the manifest are skipped, logs that changed are
+        re-parsed and their rows replaced, and rows of deleted logs are removed.
+        
+        Returns the names of the logs that were loaded or removed.
+        """
+        start = time.perf_counter()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest = None if full else self.load_manifest()
+        incremental = manifest is not None
+        if not incremental:
+            manifest = {}
+        
+        conn = self.open_db(fresh=not incremental)
+        self.create_callsigns_table(conn)
+        self.create_stations_table(conn)
+        self.create_qsos_table(conn)
+        self.create_manifest_table(conn)
+        create_summary_tables(conn)
+        create_multipliers_table(conn)
+        create_leaderboard_table(conn)
+        create_rate_tables(conn)
+        self.load_call_ids(conn)
+        
+        log_files = self.log_files()
+        present = {log_file.name for log_file in log_files}
+        removed = [name for name in manifest if name not in present]
+        candidates = []
+        for log_file in log_files:
+            entry = manifest.get(log_file.name)
+            if entry is None or (entry[0], entry[1]) != (log_file.size, log_file.mtime_ns):
+                candidates.append(log_file)
+        
+        # Station ids whose duplicate flags need recomputing
+        changed_stations = set()
+        changed_logs = set(removed)
+        # An update takes each station's counts out of the summary tables
+        # before touching its rows and adds them back at the end, and notes
+        # which leaderboard rankings the station was in
+        deltas = SummaryDeltas(conn) if incremental else None
+        boards = LeaderboardDeltas(conn) if incremental else None
+        
+        def release(station_ids):
+            # Rankings first: the band and mode keys are read from the summary counts
+            boards.release(station_ids)
+            deltas.release(station_ids)
+        
+        for log_name in removed:
+            release(self.log_station_ids(conn, log_name))
+            changed_stations |= self.delete_log(conn, log_name)
+        
+        if self.workers > 1:
+            # Workers only parse; this process is the single database writer
+            print(f"Reading {len(candidates)} logs with {self.workers} worker processes...")
+        else:
+            print(f"Reading {len(candidates)} logs...")
+        
+        def load(parsed):
+            station_id = self.call_id(conn, self.station_callsign(parsed.log_file, parsed.metadata))
+            if incremental:
+                release({station_id})
+            changed_stations.add(station_id)
+            self.insert_station(conn, parsed.log_file, parsed.metadata)
+            self.insert_qso_rows(conn, self.add_call_ids(conn, parsed.rows))
+            self.update_manifest(conn, parsed)
+            changed_logs.add(parsed.log_file.name)
+        
+        log_count = 0
+        for parsed in self.iter_parsed_logs(candidates):
+            entry = manifest.get(parsed.log_file.name)
+            if entry is not None:
+                if entry[2] == parsed.sha256:
+                    # Touched but not modified; just remember the new stat
+                    self.update_manifest(conn, parsed)
+                    continue
+                release(self.log_station_ids(conn, parsed.log_file.name))
+                changed_stations |= self.delete_log(conn, parsed.log_file.name)
+            load(parsed)
+            log_count += 1
+        
+        # Logs sharing a callsign with a changed or removed log are loaded
+        # again together with it, in log order: as in a full build, the last
+        # log's header is the stations row and the first copy of a
+        # duplicate contact is the one kept
+        if changed_stations and incremental:
+            group = self.station_logs(conn, changed_stations)
+            if group - changed_logs:
+                reload = [log_file for log_file in log_files if log_file.name in group]
+                for log_file in reload:
+                    release(self.log_station_ids(conn, log_file.name))
+                    changed_stations |= self.delete_log(conn, log_file.name)
+                for parsed in self.iter_parsed_logs(reload):
+                    load(parsed)
+        
+        # Flag duplicate QSOs once here instead of in every chart query
+        self.refresh_duplicates(conn, changed_stations if incremental else None)
+        if incremental:
+            deltas.finish()
+        else:
+            apply_station_deltas(conn)
+        score_stations(conn, changed_stations if incremental else None)
+        update_rates(conn, changed_stations if incremental else None)
+        if incremental:
+            boards.finish()
+        else:
+            refresh_leaderboards(conn)
+        
+        # Indexes are built after the load (and kept between incremental runs,
+        # where they also speed up the per-log deletes)
+        index_database(conn, full=not incremental)
+        
+        # Foreign keys are declared but not enforced (two logs may share a
+        # callsign); report QSOs whose station row is missing instead
+        orphans = conn.execute('SELECT COUNT(*) FROM pragma_foreign_key_check(\'qsos\')').fetchone()[0]
+        if orphans:
+            print(f"Warning: {orphans} QSOs have no matching stations row")
+        
+        changed = bool(changed_logs) or not incremental
+        self.close_db(conn, changed=changed)
+        if changed or not self.in_memory:
+            print(f"{'Updated' if incremental else 'Created'} {self.db_path}")
+        else:
+            print(f"No logs changed; left {self.db_path} as it was")
+        mode = 'bulk' if self.bulk else 'row-by-row'
+        print(f"Done! ({log_count} logs loaded, {len(removed)} removed, "
+              f"{len(log_files) - log_count} unchanged; {mode} load in {time.perf_counter() - start:.2f}s)")
+        return changed_logs
 
 if __name__ == '__main__':
-    LOGS_DIR = '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs'
-    OUTPUT_DIR = '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data'
+    parser = argparse.ArgumentParser(description='Create the SQL database from NYQP log files.')
+    parser.add_argument('--logs-dir', default=LOGS_DIR,
+                        help='directory of logs and log archives, or a single archive')
+    parser.add_argument('--db', default=CONTEST_DB)
+    parser.add_argument('--workers', type=int, default=1,
+                        help=f'parser processes for a parallel build (this machine has {os.cpu_count()} cores)')
+    parser.add_argument('--no-bulk', dest='bulk', action='store_false',
+                        help='insert one QSO at a time with default pragmas (for timing comparisons)')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--no-fast-parse', dest='fast_parse', action='store_false',
+                        help='parse QSO lines with the str parser instead of the bytes fast path')
+    parser.add_argument('--full', action='store_true',
+                        help='delete the database and re-parse every log')
+    parser.add_argument('--in-memory', action='store_true',
+                        help='build in memory and atomically replace the database file when done')
+    args = parser.parse_args()
     
-    creator = NYQPDatabaseCreator(LOGS_DIR, OUTPUT_DIR)
-    creator.create_databases()
+    creator = NYQPDatabaseCreator(args.logs_dir, args.db, workers=args.workers,
+                                  bulk=args.bulk, batch_size=args.batch_size,
+                                  fast_parse=args.fast_parse, in_memory=args.in_memory)
+    creator.create_database(full=args.full)
@@ -4,35 +4,20 @@ Create thumbnail images for the chart gallery
 """
 
 from PIL import Image
-import os
-from pathlib import Path
+
+from paths import CHART_FILES, CHARTS_DIR, THUMBNAILS_DIR
 
 def create_thumbnails():
     """Create thumbnail versions of all chart images."""
     
-    charts_dir = Path('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/charts')
-    thumbs_dir = charts_dir / 'thumbnails'
-    thumbs_dir.mkdir(exist_ok=True)
+    charts_dir = CHARTS_DIR
+    thumbs_dir = THUMBNAILS_DIR
+    thumbs_dir.mkdir(parents=True, exist_ok=True)
     
     # Thumbnail size
     thumb_size = (300, 200)
     
-    # List of chart files to create thumbnails for
-    chart_files = [
-        'NYQP_2025_BoxPlotOfScoreByCategory.png',
-        'NYQP_2025_DistributionOfQSOsByLocationAndMode.png', 
-        'NYQP_2025_HistogramOfQSO_Totals.png',
-        'NYQP_2025_160m_Activity.png',
-        'NYQP_2025_80m_Activity.png',
-        'NYQP_2025_40m_Activity.png',
-        'NYQP_2025_20m_Activity.png',
-        'NYQP_2025_15m_Activity.png',
-        'NYQP_2025_10m_Activity.png',
-        'NYQP_2025_AllBands_CW_Activity.png',
-        'NYQP_2025_AllBands_PH_Activity.png'
-    ]
-    
-    for chart_file in chart_files:
+    for chart_file in CHART_FILES:
         chart_path = charts_dir / chart_file
         thumb_path = thumbs_dir / f"thumb_{chart_file}"
         
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Export the qsos and stations tables to a columnar on-disk format, and load
+them back without going through the sqlite3 cursor.
+
+Run after create_sql_db.py. Output goes to COLUMNS_DIR:
+
+    <table>.parquet              when pyarrow is installed
+    <table>/<column>.npy         otherwise: one memory-mappable array per column
+    manifest.json                source database size/mtime and column layout
+
+In the .npy layout integer columns are int64 (NULLs are listed in a
+<column>.mask.npy next to them) and text columns are dictionary encoded:
+<column>.codes.npy holds int32 codes (-1 for NULL) into <column>.values.json.
+A few thousand distinct calls and counties repeat across millions of rows,
+so the codes are small and group-bys become integer operations.
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from paths import COLUMNS_DIR, CONTEST_DB
+
+TABLES = ('qsos', 'stations')
+MANIFEST = 'manifest.json'
+
+def read_table(conn, table, batch_size=100000):
+    """Read every column of a table in rowid order.
+
+    Returns {column: (declared type, list of values)}.
+    """
+    declared = {row[1]: row[2].upper() for row in conn.execute(f'PRAGMA table_info({table})')}
+    columns = {name: [] for name in declared}
+    cursor = conn.execute(f"SELECT {', '.join(declared)} FROM {table} ORDER BY rowid")
+    while batch := cursor.fetchmany(batch_size):
+        for values, column in zip(columns.values(), zip(*batch)):
+            values.extend(column)
+    return {name: (declared[name], values) for name, values in columns.items()}
+
+def encode_column(declared, values):
+    """Encode one column as ('int', data, mask) or ('text', codes, vocabulary).
+
+    An INTEGER column is stored as integers only if every non-NULL value is
+    an int; SQLite will happily keep text in an INTEGER column.
+    """
+    if 'INT' in declared and all(type(v) is int or v is None for v in values):
+        mask = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+        data = np.fromiter((0 if v is None else v for v in values), dtype=np.int64, count=len(values))
+        return 'int', data, mask
+
+    lookup = {}
+    codes = np.fromiter((-1 if v is None else lookup.setdefault(str(v), len(lookup)) for v in values),
+                        dtype=np.int32, count=len(values))
+    return 'text', codes, list(lookup)
+
+def write_npy(table_dir, name, kind, data, extra):
+    np.save(table_dir / f'{name}.{"data" if kind == "int" else "codes"}.npy', data)
+    if kind == 'int':
+        if extra.any():
+            np.save(table_dir / f'{name}.mask.npy', extra)
+    else:
+        (table_dir / f'{name}.values.json').write_text(json.dumps(extra))
+
+def to_arrow(kind, data, extra):
+    if kind == 'int':
+        return pa.array(data, mask=extra)
+    return pa.DictionaryArray.from_arrays(pa.array(data, mask=data < 0), pa.array(extra, type=pa.string()))
+
+def export_columns(db_path=CONTEST_DB, columns_dir=COLUMNS_DIR, fmt=None):
+    """Export TABLES from db_path into columns_dir. Returns {table: row count}."""
+    fmt = fmt or ('parquet' if pq is not None else 'npy')
+    if fmt == 'parquet' and pq is None:
+        raise RuntimeError('Parquet export needs pyarrow (pip install pyarrow)')
+
+    db_path = Path(db_path)
+    columns_dir = Path(columns_dir)
+    columns_dir.mkdir(parents=True, exist_ok=True)
+    # Readers check the manifest first, so drop it while files are replaced
+    (columns_dir / MANIFEST).unlink(missing_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    manifest = {'format': fmt, 'tables': {}}
+    for table in TABLES:
+        encoded = {name: encode_column(*column) for name, column in read_table(conn, table).items()}
+        rows = len(next(iter(encoded.values()))[1]) if encoded else 0
+
+        if fmt == 'parquet':
+            arrays = {name: to_arrow(*column) for name, column in encoded.items()}
+            pq.write_table(pa.table(arrays), columns_dir / f'{table}.parquet')
+        else:
+            table_dir = columns_dir / table
+            table_dir.mkdir(exist_ok=True)
+            for stale in table_dir.iterdir():
+                stale.unlink()
+            for name, column in encoded.items():
+                write_npy(table_dir, name, *column)
+
+        manifest['tables'][table] = {
+            'rows': rows,
+            'columns': {name: kind for name, (kind, _, _) in encoded.items()},
+        }
+    conn.close()
+
+    stat = db_path.stat()
+    manifest['source'] = {'path': str(db_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    (columns_dir / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return {table: info['rows'] for table, info in manifest['tables'].items()}
+
+def load_manifest(columns_dir=COLUMNS_DIR):
+    path = Path(columns_dir) / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else None
+
+def export_is_current(db_path=CONTEST_DB, columns_dir=COLUMNS_DIR):
+    """True if columns_dir holds an export of db_path as it is on disk now."""
+    manifest = load_manifest(columns_dir)
+    if manifest is None or not Path(db_path).exists():
+        return False
+    stat = Path(db_path).stat()
+    source = manifest['source']
+    return (source['size'], source['mtime_ns']) == (stat.st_size, stat.st_mtime_ns)
+
+def load_npy_column(table_dir, name, kind):
+    if kind == 'int':
+        data = np.load(table_dir / f'{name}.data.npy', mmap_mode='r')
+        mask_path = table_dir / f'{name}.mask.npy'
+        if not mask_path.exists():
+            return data
+        return pd.arrays.IntegerArray(data, np.load(mask_path), copy=False)
+
+    codes = np.load(table_dir / f'{name}.codes.npy', mmap_mode='r')
+    vocabulary = json.loads((table_dir / f'{name}.values.json').read_text())
+    return pd.Categorical.from_codes(codes, vocabulary, validate=False)
+
+def load_table(table, columns=None, columns_dir=COLUMNS_DIR):
+    """Load an exported table (or just the named columns) as a DataFrame.
+
+    .npy columns are memory-mapped, so only the pages a consumer touches are
+    read. Text columns come back as pandas Categoricals over the stored
+    codes; integer columns with NULLs as nullable Int64.
+    """
+    columns_dir = Path(columns_dir)
+    manifest = load_manifest(columns_dir)
+    if manifest is None:
+        raise FileNotFoundError(f'No columnar export in {columns_dir}; run export_columns.py')
+
+    kinds = manifest['tables'][table]['columns']
+    names = list(columns) if columns is not None else list(kinds)
+    if manifest['format'] == 'parquet':
+        return pq.read_table(columns_dir / f'{table}.parquet', columns=names, memory_map=True).to_pandas()
+
+    table_dir = columns_dir / table
+    return pd.DataFrame({name: load_npy_column(table_dir, name, kinds[name]) for name in names}, copy=False)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the contest database to columnar files.')
+    parser.add_argument('--db', default=CONTEST_DB, type=Path)
+    parser.add_argument('--out', default=COLUMNS_DIR, type=Path)
+    parser.add_argument('--format', choices=['npy', 'parquet'],
+                        help='default: parquet if pyarrow is installed, otherwise npy')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = export_columns(args.db, args.out, args.format)
+    for table, rows in counts.items():
+        print(f"  {table}: {rows:,} rows")
+    print(f"Exported to {args.out} ({load_manifest(args.out)['format']}) in {time.perf_counter() - start:.2f}s")
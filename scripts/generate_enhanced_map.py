@@ -4,18 +4,13 @@ Generate enhanced interactive map from SQL databases.
 Creates county-level QSO activity visualization for NYQP 2025.
 """
 
-import sqlite3
 import json
-from pathlib import Path
 
-def get_county_data():
-    """Extract county QSO data from databases."""
-    db_path = Path("/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data")
-    
-    # Connect to databases
-    meta_conn = sqlite3.connect(db_path / "contest_meta.db")
-    qso_conn = sqlite3.connect(db_path / "contest_qsos.db")
-    
+from contest_data import board_totals, leaders, scalar
+from paths import CONTEST_DB, ENHANCED_MAP_HTML, NY_COUNTIES_JSON
+
+def get_county_data(db_path=CONTEST_DB):
+    """Extract county QSO data from the contest database."""
     # Count QSOs by county from tx_county field
     county_qsos = {}
     county_top_stations = {}
@@ -32,36 +27,16 @@ def get_county_data():
     }
     
     # Get total QSO count first
-    total_cursor = qso_conn.execute("SELECT COUNT(*) FROM qsos")
-    total_qsos = total_cursor.fetchone()[0]
-    
-    # Get QSO counts by TX county (NY stations transmitting)
-    cursor = qso_conn.execute("""
-        SELECT tx_county, tx_call, COUNT(*) as qso_count
-        FROM qsos 
-        WHERE tx_county IS NOT NULL AND tx_county != ''
-        GROUP BY tx_county, tx_call
-        ORDER BY tx_county, qso_count DESC
-    """)
+    total_qsos = scalar("SELECT COALESCE(SUM(qsos), 0) FROM station_counts", db_path=db_path)
     
-    for county, callsign, qso_count in cursor.fetchall():
-        county = county.upper()
+    # QSO totals and top 5 stations by TX county, from the county leaderboard
+    top_stations = leaders('county', 5, db_path)
+    for county, qso_count in board_totals('county', db_path).items():
         # Only include valid NY counties
         if county in valid_ny_counties:
-            if county not in county_qsos:
-                county_qsos[county] = 0
-                county_top_stations[county] = []
-            
-            county_qsos[county] += qso_count
-            county_top_stations[county].append({"call": callsign, "qsos": qso_count})
-    
-    # Sort and limit top stations per county
-    for county in county_top_stations:
-        county_top_stations[county].sort(key=lambda x: x["qsos"], reverse=True)
-        county_top_stations[county] = county_top_stations[county][:5]
-    
-    meta_conn.close()
-    qso_conn.close()
+            county_qsos[county] = qso_count
+            county_top_stations[county] = [{"call": entry.call, "qsos": entry.value}
+                                           for entry in top_stations[county]]
     
     return county_qsos, county_top_stations, total_qsos
 
@@ -106,7 +81,7 @@ def generate_map_html():
     print(f"Debug: County count breakdown: {len(county_qsos)} counties with data")
     
     # Load NY county boundaries from JSON file
-    boundaries_file = '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data/ny_counties.json'
+    boundaries_file = NY_COUNTIES_JSON
     try:
         with open(boundaries_file, 'r') as f:
             boundaries_data = json.load(f)
@@ -332,7 +307,7 @@ def generate_map_html():
 
 def main():
     """Generate enhanced map HTML file."""
-    output_path = Path("/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/html/nyqp_enhanced_map.html")
+    output_path = ENHANCED_MAP_HTML
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
     html_content = generate_map_html()
@@ -3,84 +3,91 @@
 Generate contest statistics for web display
 """
 
-import sqlite3
+import hashlib
 import json
+from collections import Counter, namedtuple
 from pathlib import Path
 
-def generate_contest_stats():
-    """Generate summary statistics from the databases."""
-    
-    meta_db = Path('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data/contest_meta.db')
-    qso_db = Path('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data/contest_qsos.db')
-    
-    stats = {}
-    
-    # Meta database stats
-    meta_conn = sqlite3.connect(meta_db)
-    
-    # Total logs submitted
-    stats['total_logs'] = meta_conn.execute("SELECT COUNT(*) FROM stations").fetchone()[0]
-    
-    # Unique callsigns (should be same as total logs)
-    stats['unique_callsigns'] = meta_conn.execute("SELECT COUNT(DISTINCT callsign) FROM stations").fetchone()[0]
-    
-    # NY vs Non-NY stations (based on location field)
-    ny_count = meta_conn.execute("SELECT COUNT(*) FROM stations WHERE location = 'NY'").fetchone()[0]
-    stats['ny_stations'] = ny_count
-    stats['non_ny_stations'] = stats['total_logs'] - ny_count
-    
-    # Official overlay categories
-    overlay_counts = {}
-    for overlay in ['ROOKIE', 'YOUTH12', 'YOUTH17', 'YL']:
-        count = meta_conn.execute("SELECT COUNT(*) FROM stations WHERE overlay = ?", (overlay,)).fetchone()[0]
-        if count > 0:
-            overlay_counts[overlay] = count
-    stats['official_overlays'] = overlay_counts
-    
-    # Unofficial overlay categories
-    unofficial_overlays = {}
-    for row in meta_conn.execute("SELECT overlay, COUNT(*) FROM stations WHERE overlay NOT IN ('ROOKIE', 'YOUTH12', 'YOUTH17', 'YL') AND overlay IS NOT NULL AND overlay != '' GROUP BY overlay"):
-        unofficial_overlays[row[0]] = row[1]
-    stats['unofficial_overlays'] = unofficial_overlays
-    
-    # Station types
-    station_types = {}
-    for row in meta_conn.execute("SELECT station_type, COUNT(*) FROM stations WHERE station_type IS NOT NULL AND station_type != '' GROUP BY station_type"):
-        station_types[row[0]] = row[1]
-    stats['station_types'] = station_types
-    
-    # Operator categories
-    operator_categories = {}
-    for row in meta_conn.execute("SELECT operator_category, COUNT(*) FROM stations WHERE operator_category IS NOT NULL AND operator_category != '' GROUP BY operator_category"):
-        operator_categories[row[0]] = row[1]
-    stats['operator_categories'] = operator_categories
-    
-    # Power levels
-    power_levels = {}
-    for row in meta_conn.execute("SELECT power, COUNT(*) FROM stations WHERE power IS NOT NULL AND power != '' GROUP BY power"):
-        power_levels[row[0]] = row[1]
-    stats['power_levels'] = power_levels
-    
-    # Get NY callsigns first
-    ny_callsigns = [row[0] for row in meta_conn.execute("SELECT callsign FROM stations WHERE location = 'NY'")]
-    
-    meta_conn.close()
-    
-    # QSO database stats
-    qso_conn = sqlite3.connect(qso_db)
-    
-    # Total QSOs
-    stats['total_qsos'] = qso_conn.execute("SELECT COUNT(*) FROM qsos").fetchone()[0]
-    
-    # QSOs by NY stations
-    if ny_callsigns:
-        placeholders = ','.join('?' * len(ny_callsigns))
-        stats['qsos_by_ny'] = qso_conn.execute(f"SELECT COUNT(*) FROM qsos WHERE station_call IN ({placeholders})", ny_callsigns).fetchone()[0]
-    else:
-        stats['qsos_by_ny'] = 0
-    
-    qso_conn.close()
-    
+from contest_data import connect
+from paths import CONTEST_DB, CONTEST_YEAR, STATS_CACHE_JSON, STATS_HTML, STATS_JSON
+
+OFFICIAL_OVERLAYS = ['ROOKIE', 'YOUTH12', 'YOUTH17', 'YL']
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# The stations columns the stats read, fetched in one scan
+StationRow = namedtuple('StationRow', 'callsign call_id location overlay station_type operator_category power')
+
+def counts_by(values):
+    """{value: count} for the non-empty values, in sorted order like SQL GROUP BY."""
+    return dict(sorted(Counter(value for value in values if value).items()))
+
+# Every statistic, in output order, as a function of the stations rows and
+# {station_id: QSOs}; a new statistic is one more entry here, not another query
+STATS = {
+    'total_logs': lambda stations, qsos: len(stations),
+    'unique_callsigns': lambda stations, qsos: len({s.callsign for s in stations}),
+    'ny_stations': lambda stations, qsos: sum(s.location == 'NY' for s in stations),
+    'non_ny_stations': lambda stations, qsos: sum(s.location != 'NY' for s in stations),
+    'official_overlays': lambda stations, qsos: {
+        overlay: count for overlay, count in
+        ((overlay, sum(s.overlay == overlay for s in stations)) for overlay in OFFICIAL_OVERLAYS) if count
+    },
+    'unofficial_overlays': lambda stations, qsos: counts_by(
+        s.overlay for s in stations if s.overlay not in OFFICIAL_OVERLAYS),
+    'station_types': lambda stations, qsos: counts_by(s.station_type for s in stations),
+    'operator_categories': lambda stations, qsos: counts_by(s.operator_category for s in stations),
+    'power_levels': lambda stations, qsos: counts_by(s.power for s in stations),
+    'total_qsos': lambda stations, qsos: sum(qsos.values()),
+    # QSOs whose station has a NY stations row
+    'qsos_by_ny': lambda stations, qsos: sum(
+        qsos.get(call_id, 0) for call_id in {s.call_id for s in stations if s.location == 'NY'}),
+}
+
+def compute_stats(stations, qsos):
+    """Evaluate STATS over stations rows and {station_id: QSO count}."""
+    return {name: stat(stations, qsos) for name, stat in STATS.items()}
+
+def stats_fingerprint(db_path=CONTEST_DB):
+    """Hash of the logs in the database and the code that turned them into stats.
+
+    The stats only change when a log's contents change, or the code does:
+    this script (STATS, OFFICIAL_OVERLAYS), the ingest that parsed the
+    headers or the schema version the database was built with. Every
+    script in SCRIPTS_DIR is hashed rather than working out which ones
+    those are; an unrelated edit just costs one recompute.
+    """
+    conn = connect(db_path)
+    digest = hashlib.sha256(f"schema {conn.execute('PRAGMA user_version').fetchone()[0]}\n".encode())
+    for path in sorted(SCRIPTS_DIR.glob('*.py')):
+        digest.update(f'{path.name}\0'.encode() + path.read_bytes())
+    for log_file, sha256 in conn.execute('SELECT log_file, sha256 FROM log_manifest ORDER BY log_file'):
+        digest.update(f'{log_file}\0{sha256}\n'.encode())
+    return digest.hexdigest()
+
+def generate_contest_stats(db_path=CONTEST_DB, cache_path=STATS_CACHE_JSON):
+    """Generate summary statistics from the contest database.
+    
+    Reads the stations table and the per-station QSO counts the ingest keeps
+    in station_counts, unless cache_path holds stats for the same fingerprint.
+    Pass cache_path=None to always recompute.
+    """
+    fingerprint = stats_fingerprint(db_path) if cache_path is not None else None
+    if cache_path is not None and cache_path.exists():
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached.get('fingerprint') == fingerprint:
+            return cached['stats']
+    
+    conn = connect(db_path)
+    stations = [StationRow(*row) for row in conn.execute(f"SELECT {', '.join(StationRow._fields)} FROM stations")]
+    qsos = dict(conn.execute("SELECT station_id, qsos FROM station_counts"))
+    stats = compute_stats(stations, qsos)
+    
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'stats': stats}, f)
     return stats
 
 def format_stats_html(stats):
@@ -88,7 +95,7 @@ def format_stats_html(stats):
     
     html = f"""
 <div class="contest-stats">
-    <h2>2025 New York QSO Party Statistics</h2>
+    <h2>{CONTEST_YEAR} New York QSO Party Statistics</h2>
     
     <div class="stat-section">
         <h3>Participation</h3>
@@ -164,14 +171,16 @@ def format_stats_html(stats):
 
 if __name__ == '__main__':
     stats = generate_contest_stats()
+    STATS_JSON.parent.mkdir(parents=True, exist_ok=True)
+    STATS_HTML.parent.mkdir(parents=True, exist_ok=True)
     
     # Save as JSON
-    with open('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data/contest_stats.json', 'w') as f:
+    with open(STATS_JSON, 'w') as f:
         json.dump(stats, f, indent=2)
     
     # Save as HTML
     html = format_stats_html(stats)
-    with open('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/html/contest_stats.html', 'w') as f:
+    with open(STATS_HTML, 'w') as f:
         f.write(html)
     
     print("Contest Statistics:")
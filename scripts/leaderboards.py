@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Ranked leaderboards kept in the database, so pages read a top N directly.
+
+The leaderboard table holds every ranking in full, one row per entry:
+
+    board     county, category, band or mode
+    key       which county, category, band name or mode class
+    rank      1 for the leader (ties broken by call)
+    call      the ranked station
+    value     what it is ranked by (see BOARDS)
+
+Ranks are assigned with ROW_NUMBER() over each key's entries. The primary
+key is (board, key, rank) on a WITHOUT ROWID table, so a top-N lookup is a
+single range scan:
+
+    SELECT rank, call, value FROM leaderboard
+    WHERE board = 'county' AND key = 'ALB' AND rank <= 5
+
+create_sql_db.py refreshes the tables after each ingest. An incremental
+ingest only re-ranks the keys the changed stations appeared under before
+or after the update; every other key's ranking cannot have moved. The band
+and mode boards rank from the station_bands summary table
+(summary_tables.py), so re-ranking a key never scans the qsos table.
+"""
+
+# board: (source query with a {keys} filter, key expression, query for the
+#         keys a set of station ids ({ids}) contributes to)
+BOARDS = {
+    # QSOs sent from each county per transmitting call (all QSOs, as on the map)
+    'county': (
+        """SELECT UPPER(cc.tx_county) AS key, c.call, SUM(cc.qsos) AS value
+           FROM call_counts cc JOIN callsigns c ON c.id = cc.tx_call_id
+           WHERE cc.tx_county != '' AND {keys}
+           GROUP BY key, cc.tx_call_id""",
+        'UPPER(cc.tx_county)',
+        "SELECT DISTINCT UPPER(tx_county) FROM qsos WHERE tx_county != '' AND station_id IN ({ids})",
+    ),
+    # Computed score (scoring.py) within each operator/power/mode category
+    'category': (
+        """SELECT s.operator_category || ' ' || s.power || ' ' || s.mode AS key, s.callsign AS call,
+                  s.computed_score AS value
+           FROM stations s
+           WHERE s.operator_category != 'CHECKLOG' AND key IS NOT NULL AND {keys}""",
+        "s.operator_category || ' ' || s.power || ' ' || s.mode",
+        """SELECT DISTINCT operator_category || ' ' || power || ' ' || mode FROM stations
+           WHERE operator_category != 'CHECKLOG' AND call_id IN ({ids})""",
+    ),
+    # Unique QSOs per station on each band (from the station_bands summary table)
+    'band': (
+        """SELECT b.name AS key, c.call, SUM(sb.qsos) AS value
+           FROM station_bands sb JOIN bands b ON b.code = sb.band JOIN callsigns c ON c.id = sb.station_id
+           WHERE {keys}
+           GROUP BY key, sb.station_id""",
+        'b.name',
+        """SELECT DISTINCT b.name FROM station_bands sb JOIN bands b ON b.code = sb.band
+           WHERE sb.station_id IN ({ids})""",
+    ),
+    # Unique QSOs per station in each mode class
+    'mode': (
+        """SELECT sb.mode_class AS key, c.call, SUM(sb.qsos) AS value
+           FROM station_bands sb JOIN callsigns c ON c.id = sb.station_id
+           WHERE {keys}
+           GROUP BY key, sb.station_id""",
+        'sb.mode_class',
+        "SELECT DISTINCT mode_class FROM station_bands WHERE station_id IN ({ids})",
+    ),
+}
+
+def create_leaderboard_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            board TEXT NOT NULL,
+            key TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            call TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (board, key, rank)
+        ) WITHOUT ROWID
+    ''')
+
+def board_keys(conn, station_ids):
+    """Return the (board, key) rankings the given stations currently appear in."""
+    station_ids = sorted(station_ids)
+    if not station_ids:
+        return set()
+    ids = ', '.join('?' * len(station_ids))
+    return {(board, row[0])
+            for board, (_, _, keys_sql) in BOARDS.items()
+            for row in conn.execute(keys_sql.format(ids=ids), station_ids)
+            if row[0] is not None}
+
+def refresh_leaderboards(conn, keys=None):
+    """Re-rank the given (board, key) pairs, or every board if keys is None."""
+    for board, (source, key_expr, _) in BOARDS.items():
+        if keys is None:
+            conn.execute('DELETE FROM leaderboard WHERE board = ?', (board,))
+            key_filter, params = 'true', []
+        else:
+            names = sorted(key for name, key in keys if name == board)
+            if not names:
+                continue
+            marks = ', '.join('?' * len(names))
+            conn.execute(f'DELETE FROM leaderboard WHERE board = ? AND key IN ({marks})', [board] + names)
+            key_filter, params = f'{key_expr} IN ({marks})', names
+        conn.execute(f'''
+            INSERT INTO leaderboard (board, key, rank, call, value)
+            SELECT ?, key, ROW_NUMBER() OVER (PARTITION BY key ORDER BY value DESC, call), call, value
+            FROM ({source.format(keys=key_filter)})
+        ''', [board] + params)
+
+class LeaderboardDeltas:
+    """Collects the rankings an incremental ingest can change.
+
+    Call release() with a station's ids before changing any of its rows or
+    releasing its summary counts, and finish() once the summary tables and
+    scores are up to date.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.released = set()
+        self.stale = set()
+
+    def release(self, station_ids):
+        new = set(station_ids) - self.released
+        self.stale |= board_keys(self.conn, new)
+        self.released |= new
+
+    def finish(self):
+        refresh_leaderboards(self.conn, self.stale | board_keys(self.conn, self.released))
+        self.released = set()
+        self.stale = set()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Find Cabrillo logs in a logs directory or archive and read them without
+extracting anything to disk.
+
+Plain *.log files are read directly. Archives are opened in place:
+    *.zip            every *.log member
+    *.tar.gz, *.tgz  every *.log member (also .tar, .tar.bz2, .tar.xz)
+    *.log.gz         a single gzipped log
+"""
+
+import gzip
+import tarfile
+import zipfile
+from datetime import datetime
+from itertools import groupby
+from pathlib import Path, PurePosixPath
+
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+class LogSource:
+    """One log: a plain file, a gzipped file, or a member of an archive.
+
+    name is the log's file name (the key the manifest and the log_file
+    columns use); size and mtime_ns come from the file or the archive
+    member header. Zip and gz headers are read without decompressing; a
+    compressed tar has to be decompressed to list its members, so tar
+    listings are cached per archive (see tar_sources). Small and
+    picklable so it can be handed to parser processes.
+    """
+    __slots__ = ('path', 'member', 'name', 'size', 'mtime_ns')
+
+    def __init__(self, path, member, name, size, mtime_ns):
+        self.path = path
+        self.member = member
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    @property
+    def stem(self):
+        return PurePosixPath(self.name).stem
+
+    def __str__(self):
+        return str(self.path) if self.member is None else f'{self.path}!{self.member}'
+
+    def __repr__(self):
+        return f'LogSource({str(self)!r})'
+
+def is_log_name(name):
+    return name.lower().endswith('.log')
+
+def archive_kind(path):
+    """Return 'zip', 'tar', 'gz' or None for a path in the logs directory."""
+    name = path.name.lower()
+    if name.endswith('.zip'):
+        return 'zip'
+    if name.endswith(TAR_SUFFIXES):
+        return 'tar'
+    if name.endswith('.log.gz'):
+        return 'gz'
+    return None
+
+def zip_sources(path):
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if not info.is_dir() and is_log_name(info.filename):
+                mtime = datetime(*info.date_time).timestamp()
+                yield LogSource(path, info.filename, PurePosixPath(info.filename).name,
+                                info.file_size, int(mtime * 1e9))
+
+# {tar path: ((size, mtime_ns) of the archive, its LogSources)}
+_tar_listings = {}
+
+def tar_sources(path):
+    """The log members of a tar archive.
+
+    Listing a .tar.gz/.tgz/.tar.bz2/.tar.xz decompresses the whole stream,
+    so the listing is kept for as long as the archive's own size and mtime
+    are unchanged; a process polling the logs directory (watch_logs.py)
+    only pays for it when the archive is replaced.
+    """
+    stat = path.stat()
+    key = (stat.st_size, stat.st_mtime_ns)
+    cached = _tar_listings.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with tarfile.open(path) as tf:
+        sources = [LogSource(path, info.name, PurePosixPath(info.name).name, info.size, int(info.mtime * 1e9))
+                   for info in tf if info.isfile() and is_log_name(info.name)]
+    _tar_listings[path] = (key, sources)
+    return sources
+
+def gz_source(path):
+    stat = path.stat()
+    return LogSource(path, None, path.name[:-len('.gz')], stat.st_size, stat.st_mtime_ns)
+
+def archive_sources(path):
+    kind = archive_kind(path)
+    if kind == 'zip':
+        return list(zip_sources(path))
+    if kind == 'tar':
+        return list(tar_sources(path))
+    if kind == 'gz':
+        return [gz_source(path)]
+    raise ValueError(f'Not a log archive: {path}')
+
+def list_sources(logs_path):
+    """List every log under logs_path, a directory or a single archive.
+
+    Plain logs come first (in glob order, as before archives were
+    supported), then archives in name order with their members in archive
+    order. A log name seen twice is skipped with a warning, since the
+    name identifies a log in the database.
+    """
+    logs_path = Path(logs_path)
+    if logs_path.is_file():
+        candidates = archive_sources(logs_path)
+    else:
+        candidates = []
+        for path in logs_path.glob('*.log'):
+            stat = path.stat()
+            candidates.append(LogSource(path, None, path.name, stat.st_size, stat.st_mtime_ns))
+        for path in sorted(logs_path.iterdir()):
+            if path.is_file() and archive_kind(path):
+                candidates.extend(archive_sources(path))
+
+    sources = []
+    seen = {}
+    for source in candidates:
+        if source.name in seen:
+            print(f"Warning: skipping {source}, {source.name} already read from {seen[source.name]}")
+            continue
+        seen[source.name] = source
+        sources.append(source)
+    return sources
+
+def read_source(source):
+    """Return the full (decompressed) contents of one log."""
+    if source.member is None:
+        if archive_kind(source.path) == 'gz':
+            with gzip.open(source.path) as f:
+                return f.read()
+        return source.path.read_bytes()
+    if archive_kind(source.path) == 'zip':
+        with zipfile.ZipFile(source.path) as zf:
+            return zf.read(source.member)
+    with tarfile.open(source.path) as tf:
+        return tf.extractfile(source.member).read()
+
+def iter_contents(sources):
+    """Yield (source, contents) for every source, in order.
+
+    Each archive is opened once for its run of consecutive members. Tar
+    archives are walked as a stream, since a compressed tar cannot seek
+    to a member without decompressing everything before it.
+    """
+    for path, group in groupby(sources, key=lambda source: source.path):
+        group = list(group)
+        kind = archive_kind(path) if group[0].member is not None else None
+        if kind == 'zip':
+            with zipfile.ZipFile(path) as zf:
+                for source in group:
+                    yield source, zf.read(source.member)
+        elif kind == 'tar':
+            wanted = {source.member: source for source in group}
+            with tarfile.open(path, mode='r|*') as tf:
+                for info in tf:
+                    source = wanted.pop(info.name, None)
+                    if source is not None:
+                        yield source, tf.extractfile(info).read()
+        else:
+            for source in group:
+                yield source, read_source(source)
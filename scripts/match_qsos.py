@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Cross-check logs: pair every QSO with its counterpart in the other station's log.
+Two QSOs match when each side logged the other's call on the same band and
+mode class within a time tolerance. The result is written back to
+qsos.match_id / qsos.match_status for scoring, busted-call and NIL reports.
+
+Match status values:
+    MATCHED  counterpart found (match_id is its qsos.id)
+    NIL      the other station sent in a log, but this QSO is not in it
+    NO_LOG   the other station did not send in a log
+    DUPE     duplicate copy of a contact (qsos.is_dup = 1)
+    INVALID  no usable band or time, so it cannot be checked
+"""
+
+import argparse
+import sqlite3
+import time
+from collections import Counter, defaultdict
+
+from paths import CONTEST_DB
+
+# Default clock tolerance in minutes between the two logs of one contact
+TOLERANCE = 10
+
+def load_sides(conn):
+    """Group checkable QSOs by (my call, their call, band, mode class).
+
+    Calls are the integer ids of their normalized form (callsigns.base_id),
+    so K2A and K2A/M are the same station. Each group is a list of
+    (minute, id) sorted by time.
+    """
+    sides = defaultdict(list)
+    for qso_id, my_call, their_call, band, mode_class, minute in conn.execute('''
+        SELECT q.id, tx.base_id, rx.base_id, q.band, q.mode_class, q.minute
+        FROM qsos q
+        JOIN callsigns tx ON tx.id = q.tx_call_id
+        JOIN callsigns rx ON rx.id = q.rx_call_id
+        WHERE q.is_dup = 0 AND q.band IS NOT NULL AND q.minute IS NOT NULL
+    '''):
+        sides[(my_call, their_call, band, mode_class)].append((minute, qso_id))
+    for entries in sides.values():
+        entries.sort()
+    return sides
+
+def match_sorted(left, right, tolerance):
+    """Greedily pair two time-sorted (minute, id) lists within tolerance.
+
+    Walking both lists in time order pairs the earliest compatible QSOs
+    first, which gives the largest possible number of matches.
+    """
+    pairs = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        diff = left[i][0] - right[j][0]
+        if diff < -tolerance:
+            i += 1
+        elif diff > tolerance:
+            j += 1
+        else:
+            pairs.append((left[i][1], right[j][1]))
+            i += 1
+            j += 1
+    return pairs
+
+def match_qsos(conn, tolerance=TOLERANCE):
+    """Match every QSO in the database and store the results.
+
+    Returns a Counter of match statuses.
+    """
+    sides = load_sides(conn)
+    logged_calls = {row[0] for row in conn.execute('''
+        SELECT c.base_id FROM stations s JOIN callsigns c ON c.id = s.call_id
+    ''')}
+
+    # Hash join: each side is looked up directly by its mirrored key, and
+    # only the two small time-sorted lists for that pair of calls are merged
+    matches = {}
+    for key, left in sides.items():
+        my_call, their_call, band, mode_class = key
+        if my_call >= their_call:
+            continue  # each pair of calls is handled once, from the lower call
+        right = sides.get((their_call, my_call, band, mode_class))
+        if right:
+            for left_id, right_id in match_sorted(left, right, tolerance):
+                matches[left_id] = right_id
+                matches[right_id] = left_id
+
+    results = []
+    for (my_call, their_call, band, mode_class), entries in sides.items():
+        unmatched = 'NIL' if their_call in logged_calls else 'NO_LOG'
+        for _, qso_id in entries:
+            match_id = matches.get(qso_id)
+            results.append((qso_id, match_id, 'MATCHED' if match_id is not None else unmatched))
+
+    # Reset every row, then apply the results through a temp table in one UPDATE
+    conn.execute('''
+        UPDATE qsos SET match_id = NULL,
+                        match_status = CASE WHEN is_dup = 1 THEN 'DUPE' ELSE 'INVALID' END
+    ''')
+    conn.execute('DROP TABLE IF EXISTS temp.match_results')
+    conn.execute('CREATE TEMP TABLE match_results (id INTEGER PRIMARY KEY, match_id INTEGER, status TEXT)')
+    conn.executemany('INSERT INTO match_results VALUES (?, ?, ?)', results)
+    conn.execute('''
+        UPDATE qsos SET match_id = r.match_id, match_status = r.status
+        FROM match_results r
+        WHERE qsos.id = r.id
+    ''')
+    conn.execute('DROP TABLE temp.match_results')
+    conn.commit()
+
+    return Counter(dict(conn.execute('SELECT match_status, COUNT(*) FROM qsos GROUP BY match_status')))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cross-check QSOs between logs.')
+    parser.add_argument('--db', default=CONTEST_DB)
+    parser.add_argument('--tolerance', type=int, default=TOLERANCE,
+                        help='maximum clock difference in minutes between the two logs')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(args.db)
+    counts = match_qsos(conn, args.tolerance)
+    conn.close()
+
+    total = sum(counts.values())
+    print(f"Checked {total:,} QSOs in {time.perf_counter() - start:.2f}s")
+    for status, count in counts.most_common():
+        print(f"  {status}: {count:,} ({count / total:.1%})")
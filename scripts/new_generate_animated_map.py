@@ -1,25 +1,27 @@
 #!/usr/bin/env python3
-import sqlite3
 import json
 
+from contest_data import connect
+from paths import ANIMATED_MAP_HTML, HTML_DIR, LOGS_DIR
+
 def get_mobile_logs():
     """Return list of mobile log files based on CATEGORY-STATION: MOBILE"""
     return [
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/ab1bl.log',
-        # '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/ad4eb.log',  # Outside NY
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/k2a.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/k2g.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/k2q-r.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/k2v.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/kq2r.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/kv2x-m.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/n1gbe.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/n2b.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/n2cu.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/n2t.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/w1wv-m.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/wi2m.log',
-        '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/logs/wt2x.log'
+        str(LOGS_DIR / 'ab1bl.log'),
+        # str(LOGS_DIR / 'ad4eb.log'),  # Outside NY
+        str(LOGS_DIR / 'k2a.log'),
+        str(LOGS_DIR / 'k2g.log'),
+        str(LOGS_DIR / 'k2q-r.log'),
+        str(LOGS_DIR / 'k2v.log'),
+        str(LOGS_DIR / 'kq2r.log'),
+        str(LOGS_DIR / 'kv2x-m.log'),
+        str(LOGS_DIR / 'n1gbe.log'),
+        str(LOGS_DIR / 'n2b.log'),
+        str(LOGS_DIR / 'n2cu.log'),
+        str(LOGS_DIR / 'n2t.log'),
+        str(LOGS_DIR / 'w1wv-m.log'),
+        str(LOGS_DIR / 'wi2m.log'),
+        str(LOGS_DIR / 'wt2x.log')
     ]
 
 def get_ny_counties():
@@ -54,7 +56,7 @@ def get_county_names():
 
 def load_database_data():
     """Load all required data from database"""
-    conn = sqlite3.connect('/home/mgilmer/nyqp_2025.db')
+    conn = connect('/home/mgilmer/nyqp_2025.db')
     
     # Get county QSO counts for coloring
     ny_counties = get_ny_counties()
@@ -84,12 +86,11 @@ def load_database_data():
             'county': row[2]
         })
     
-    conn.close()
     return county_counts, mobile_qsos
 
 def load_reference_data():
     """Load boundaries and mobile track data from reference file"""
-    with open('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/html/_nyqp_2025_animated.html', 'r') as f:
+    with open(HTML_DIR / '_nyqp_2025_animated.html', 'r') as f:
         content = f.read()
         
         # Extract boundaries
@@ -902,7 +903,7 @@ def generate_animated_map():
         mobile_config_json, mobile_tracks_json, county_coords_json
     )
     
-    output_path = '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/html/nyqp_2025_mobile_animation.html'
+    output_path = ANIMATED_MAP_HTML
     with open(output_path, 'w') as f:
         f.write(html_content)
     
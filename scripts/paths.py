@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Shared file locations for the NYQP analysis scripts.
+Set NYQP_DIR to point the scripts at a different contest directory.
+"""
+
+import os
+import re
+from pathlib import Path
+
+CONTEST_DIR = Path(os.environ.get('NYQP_DIR', '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025'))
+
+# Each contest year has its own NYQP-<year> directory next to CONTEST_DIR;
+# the year of CONTEST_DIR comes from its name unless NYQP_YEAR is set
+CONTESTS_DIR = CONTEST_DIR.parent
+_dir_year = re.fullmatch(r'NYQP-(\d{4})', CONTEST_DIR.name)
+CONTEST_YEAR = int(os.environ.get('NYQP_YEAR') or (_dir_year.group(1) if _dir_year else 2025))
+
+LOGS_DIR = CONTEST_DIR / 'logs'
+ANALYSIS_DIR = CONTEST_DIR / 'analysis'
+OUTPUTS_DIR = ANALYSIS_DIR / 'outputs'
+DATA_DIR = OUTPUTS_DIR / 'data'
+CHARTS_DIR = OUTPUTS_DIR / 'charts'
+HTML_DIR = OUTPUTS_DIR / 'html'
+
+# Single database holding the stations, qsos and log_manifest tables
+CONTEST_DB = DATA_DIR / 'contest.db'
+
+def contest_dir(year):
+    """The contest directory holding one year's logs and outputs."""
+    return CONTEST_DIR if year == CONTEST_YEAR else CONTESTS_DIR / f'NYQP-{year}'
+
+def contest_db(year):
+    """The contest.db built for one year (see contest_store.py for querying several)."""
+    return contest_dir(year) / CONTEST_DB.relative_to(CONTEST_DIR)
+
+# Columnar export of the database tables (see export_columns.py)
+COLUMNS_DIR = DATA_DIR / 'columns'
+
+# Reference data read by the map generators
+REFERENCE_DIR = ANALYSIS_DIR / 'reference'
+NY_COUNTIES_JSON = DATA_DIR / 'ny_counties.json'
+COUNTY_BOUNDARIES_JSON = REFERENCE_DIR / 'ny-counties-boundaries.json'
+
+# Generated outputs
+STATS_JSON = DATA_DIR / 'contest_stats.json'
+STATS_CACHE_JSON = DATA_DIR / 'stats_cache.json'
+STATS_HTML = HTML_DIR / 'contest_stats.html'
+ENHANCED_MAP_HTML = HTML_DIR / 'nyqp_enhanced_map.html'
+ANIMATED_MAP_HTML = HTML_DIR / f'nyqp_{CONTEST_YEAR}_mobile_animation.html'
+THUMBNAILS_DIR = CHARTS_DIR / 'thumbnails'
+
+# Running totals kept up to date by watch_logs.py during the contest
+COUNTY_COUNTS_JSON = DATA_DIR / 'county_counts.json'
+HOURLY_QSOS_JSON = DATA_DIR / 'hourly_qsos.json'
+
+# Charts written by create_charts.py (and thumbnailed by create_thumbnails.py),
+# named for the contest year
+CHART_PREFIX = f'NYQP_{CONTEST_YEAR}'
+CHART_FILES = [
+    f'{CHART_PREFIX}_BoxPlotOfScoreByCategory.png',
+    f'{CHART_PREFIX}_DistributionOfQSOsByLocationAndMode.png',
+    f'{CHART_PREFIX}_HistogramOfQSO_Totals.png',
+    f'{CHART_PREFIX}_160m_Activity.png',
+    f'{CHART_PREFIX}_80m_Activity.png',
+    f'{CHART_PREFIX}_40m_Activity.png',
+    f'{CHART_PREFIX}_20m_Activity.png',
+    f'{CHART_PREFIX}_15m_Activity.png',
+    f'{CHART_PREFIX}_10m_Activity.png',
+    f'{CHART_PREFIX}_AllBands_CW_Activity.png',
+    f'{CHART_PREFIX}_AllBands_PH_Activity.png',
+]
+
+# Written by create_charts.py only when more than one contest year is built
+YEAR_COMPARISON_CHART = 'NYQP_YearOverYear_QSOs_by_Hour.png'
+CHART_FILES.append(YEAR_COMPARISON_CHART)
+
+# Input hashes recorded by run_pipeline.py
+PIPELINE_STATE = DATA_DIR / 'pipeline_state.json'
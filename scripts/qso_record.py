@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory QSO records shared by the ingest and the map generators.
+
+QSO replaces the per-QSO dict of strings: it has __slots__ instead of a
+__dict__, and its callsign and county strings are interned, so the same few
+thousand calls and 62 county codes are stored once however many QSOs
+refer to them.
+
+Track holds one station's time-ordered (minute, county) points as two
+parallel arrays (4 bytes and 2 bytes a point) and only builds the dicts the
+map JavaScript expects when it is written out as JSON.
+"""
+
+import sys
+from array import array
+from datetime import timedelta
+
+class QSO:
+    """One Cabrillo QSO line's fields."""
+    __slots__ = ('freq', 'mode', 'date', 'time', 'tx_call', 'tx_rst', 'tx_county',
+                 'rx_call', 'rx_rst', 'rx_county')
+
+    def __init__(self, freq, mode, date, time, tx_call, tx_rst, tx_county, rx_call, rx_rst, rx_county):
+        self.freq = freq
+        self.mode = mode
+        self.date = date
+        self.time = time
+        self.tx_call = sys.intern(tx_call)
+        self.tx_rst = tx_rst
+        self.tx_county = sys.intern(tx_county)
+        self.rx_call = sys.intern(rx_call)
+        self.rx_rst = rx_rst
+        self.rx_county = sys.intern(rx_county)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if not isinstance(other, QSO):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f'QSO({self.freq} {self.mode} {self.date} {self.time} {self.tx_call} -> {self.rx_call})'
+
+# County codes shared by every Track; a county is stored as its index here
+_county_names = []
+_county_codes = {}
+
+def county_code(county):
+    code = _county_codes.get(county)
+    if code is None:
+        code = _county_codes[county] = len(_county_names)
+        _county_names.append(sys.intern(county))
+    return code
+
+class Track:
+    """A station's QSOs over time as parallel arrays of minutes and county codes.
+
+    minutes count from contest_start (qsos.minute); they are turned back
+    into 'YYYY-MM-DD HH:MM:SS' strings only by to_json().
+    """
+    __slots__ = ('contest_start', 'minutes', 'counties')
+
+    def __init__(self, contest_start):
+        self.contest_start = contest_start
+        self.minutes = array('i')
+        self.counties = array('H')
+
+    def append(self, minute, county):
+        self.minutes.append(minute)
+        self.counties.append(county_code(county))
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def __iter__(self):
+        """Yield (minute, county) pairs in the order they were added."""
+        for minute, code in zip(self.minutes, self.counties):
+            yield minute, _county_names[code]
+
+    def to_json(self, time_key):
+        """Return the track as [{time_key: datetime string, 'county': county}, ...]."""
+        datetimes = {}
+        points = []
+        for minute, county in self:
+            dt_str = datetimes.get(minute)
+            if dt_str is None:
+                dt_str = datetimes[minute] = (self.contest_start + timedelta(minutes=minute)).strftime('%Y-%m-%d %H:%M:%S')
+            points.append({time_key: dt_str, 'county': county})
+        return points
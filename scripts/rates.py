@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Per-station QSO rates: QSOs per 15-minute bucket and the best 10, 30 and
+60-minute sliding-window rates of every log.
+
+All stations are handled at once with NumPy. Each station's QSO minutes are
+placed on one sorted timeline, offset by station so that no window can
+reach into the next station's QSOs; the QSOs in the window starting at each
+QSO are then one searchsorted() away, and np.maximum.reduceat() takes each
+station's best. Bucket counts are a single bincount(). Only non-duplicate
+QSOs inside the contest period are counted.
+
+Results are stored in the database:
+
+    station_rates    station_id, qsos, best_10, best_30, best_60
+    station_buckets  station_id, bucket (minute / 15), qsos (non-empty buckets only)
+
+create_sql_db.py updates the stations an ingest touched; run this script to
+recompute every station:
+
+    python rates.py
+"""
+
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+
+from paths import CONTEST_DB
+from summary_tables import CONTEST_MINUTES
+
+# Sliding windows in minutes; each gets a best_<minutes> column
+RATE_WINDOWS = (10, 30, 60)
+
+BUCKET_MINUTES = 15
+BUCKETS = CONTEST_MINUTES // BUCKET_MINUTES
+
+def create_rate_tables(conn):
+    windows = ', '.join(f'best_{window} INTEGER NOT NULL' for window in RATE_WINDOWS)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS station_rates (
+            station_id INTEGER PRIMARY KEY REFERENCES callsigns(id),
+            qsos INTEGER NOT NULL,
+            {windows}
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS station_buckets (
+            station_id INTEGER NOT NULL REFERENCES callsigns(id),
+            bucket INTEGER NOT NULL,
+            qsos INTEGER NOT NULL,
+            PRIMARY KEY (station_id, bucket)
+        ) WITHOUT ROWID
+    ''')
+
+def load_minutes(conn, station_ids=None):
+    """Return (station ids, contest minutes) of the unique in-contest QSOs as int64 arrays.
+
+    Reads the given station ids' QSOs, or every station's if None.
+    """
+    station_filter = 'station_id IS NOT NULL'
+    params = ()
+    if station_ids is not None:
+        params = sorted(station_ids)
+        station_filter = f"station_id IN ({', '.join('?' * len(params))})"
+    rows = np.array(conn.execute(f'''
+        SELECT station_id, minute FROM qsos
+        WHERE is_dup = 0 AND minute >= 0 AND minute < {CONTEST_MINUTES} AND {station_filter}
+    ''', params).fetchall(), dtype=np.int64).reshape(-1, 2)
+    return rows[:, 0], rows[:, 1]
+
+def compute_rates(station_ids, minutes):
+    """Return (stations, QSO totals, {window: best count}, bucket counts), one entry per station.
+
+    bucket counts is a (stations, BUCKETS) array.
+    """
+    stations, index = np.unique(station_ids, return_inverse=True)
+    # A station's span is long enough that its last window ends before the next station starts
+    span = CONTEST_MINUTES + max(RATE_WINDOWS)
+    timeline = np.sort(index * span + minutes)
+    positions = np.arange(len(timeline))
+    starts = np.searchsorted(timeline, np.arange(len(stations)) * span)
+    best = {}
+    for window in RATE_WINDOWS:
+        in_window = np.searchsorted(timeline, timeline + window) - positions
+        best[window] = np.maximum.reduceat(in_window, starts) if len(stations) else in_window
+    buckets = np.bincount(index * BUCKETS + minutes // BUCKET_MINUTES,
+                          minlength=len(stations) * BUCKETS).reshape(len(stations), BUCKETS)
+    totals = np.bincount(index, minlength=len(stations))
+    return stations, totals, best, buckets
+
+def delete_rates(conn, station_ids=None):
+    if station_ids is None:
+        conn.execute('DELETE FROM station_rates')
+        conn.execute('DELETE FROM station_buckets')
+        return
+    marks = ', '.join('?' * len(station_ids))
+    conn.execute(f'DELETE FROM station_rates WHERE station_id IN ({marks})', station_ids)
+    conn.execute(f'DELETE FROM station_buckets WHERE station_id IN ({marks})', station_ids)
+
+def store_rates(conn, stations, totals, best, buckets):
+    columns = np.column_stack([stations, totals] + [best[window] for window in RATE_WINDOWS])
+    conn.executemany(f"INSERT INTO station_rates VALUES ({', '.join('?' * columns.shape[1])})",
+                     columns.tolist())
+    rows, bucket = np.nonzero(buckets)
+    conn.executemany('INSERT INTO station_buckets VALUES (?, ?, ?)',
+                     np.column_stack([stations[rows], bucket, buckets[rows, bucket]]).tolist())
+
+def update_rates(conn, station_ids=None):
+    """Recompute the rates of the given station ids (all stations if None).
+
+    Returns the number of stations with rates stored.
+    """
+    if station_ids is not None:
+        station_ids = sorted(station_ids)
+        if not station_ids:
+            return 0
+    stations, totals, best, buckets = compute_rates(*load_minutes(conn, station_ids))
+    delete_rates(conn, station_ids)
+    store_rates(conn, stations, totals, best, buckets)
+    return len(stations)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compute per-station QSO rates.')
+    parser.add_argument('--db', default=CONTEST_DB)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(args.db)
+    with conn:
+        create_rate_tables(conn)
+        stations = update_rates(conn)
+    print(f"Computed rates for {stations} stations in {time.perf_counter() - start:.2f}s")
+    best = ', '.join(f'best_{window}' for window in RATE_WINDOWS)
+    for call, *rates in conn.execute(f'''
+        SELECT c.call, {best} FROM station_rates r JOIN callsigns c ON c.id = r.station_id
+        ORDER BY best_60 DESC, c.call LIMIT 5
+    '''):
+        print(f"  {call}: " + ', '.join(f"{rate} in {window} min" for window, rate in zip(RATE_WINDOWS, rates)))
+    conn.close()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Run the analysis pipeline, skipping stages whose inputs have not changed.
+
+Each stage runs one script as its own process and declares the files it
+reads and writes. Before a stage runs, the runner hashes its inputs: the
+declared files (a directory counts as all the files in it) plus the
+stage's script and every local module the script imports. After a
+successful run the hashes are saved to PIPELINE_STATE. A stage is skipped
+when every input hash matches its last run and its outputs are still there,
+so editing one chart script re-runs the charts and thumbnails, not the
+500-log ingest.
+
+    python run_pipeline.py                 # run whatever is out of date
+    python run_pipeline.py charts stats    # only these stages
+    python run_pipeline.py export          # opt-in stages run only when named
+    python run_pipeline.py --force         # run every stage
+    python run_pipeline.py --dry-run       # show what would run
+    python run_pipeline.py -j 2            # at most two stages at once
+
+Stages that don't touch each other's files run at the same time, so once
+the database is built the stats, charts and maps take about as long as the
+slowest of them rather than their sum.
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from contest_store import available_years
+from paths import (ANIMATED_MAP_HTML, CHART_FILES, CHARTS_DIR, COLUMNS_DIR, CONTEST_DB,
+                   COUNTY_BOUNDARIES_JSON, ENHANCED_MAP_HTML, LOGS_DIR, NY_COUNTIES_JSON,
+                   PIPELINE_STATE, STATS_HTML, STATS_JSON, THUMBNAILS_DIR, contest_db)
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# Stages are separate processes; a thread per running stage just waits on it
+DEFAULT_JOBS = min(4, os.cpu_count() or 1)
+
+STATUSES = ('ran', 'up to date', 'would run', 'failed', 'blocked')
+
+# A script and the files it reads and writes. A file may be both an input
+# and an output of a stage that updates it in place (match_qsos.py).
+# An opt-in stage has no consumer in the pipeline and only runs when named.
+Stage = namedtuple('Stage', 'name script inputs outputs opt_in', defaults=[False])
+
+CHARTS = [CHARTS_DIR / name for name in CHART_FILES]
+
+# The year-over-year chart reads every built year's database
+YEAR_DBS = sorted({CONTEST_DB} | {contest_db(year) for year in available_years()})
+
+STAGES = [
+    Stage('db', 'create_sql_db.py', [LOGS_DIR], [CONTEST_DB]),
+    Stage('match', 'match_qsos.py', [CONTEST_DB], [CONTEST_DB]),
+    # The columnar export is for ad-hoc analysis; no stage reads it
+    Stage('export', 'export_columns.py', [CONTEST_DB], [COLUMNS_DIR / 'manifest.json'], opt_in=True),
+    Stage('stats', 'generate_stats.py', [CONTEST_DB], [STATS_JSON, STATS_HTML]),
+    Stage('charts', 'create_charts.py', YEAR_DBS, CHARTS),
+    Stage('thumbnails', 'create_thumbnails.py', CHARTS,
+          [THUMBNAILS_DIR / f'thumb_{name}' for name in CHART_FILES]),
+    Stage('enhanced_map', 'generate_enhanced_map.py', [CONTEST_DB, NY_COUNTIES_JSON], [ENHANCED_MAP_HTML]),
+    Stage('animated_map', 'working_generate_animated_map.py', [CONTEST_DB, COUNTY_BOUNDARIES_JSON],
+          [ANIMATED_MAP_HTML]),
+]
+
+def local_modules(script, found=None):
+    """Return the script and every module in SCRIPTS_DIR it imports, recursively."""
+    found = set() if found is None else found
+    if script in found:
+        return found
+    found.add(script)
+    for node in ast.walk(ast.parse(script.read_text())):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            module = SCRIPTS_DIR / f"{name.split('.')[0]}.py"
+            if module.exists():
+                local_modules(module, found)
+    return found
+
+class FileHasher:
+    """sha256 of files, re-read only when a file's size or mtime changes.
+
+    cache is {path: [size, mtime_ns, sha256]} and is saved with the state,
+    so an unchanged multi-gigabyte database is not re-read on every run.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def hash_file(self, path):
+        stat = path.stat()
+        entry = self.cache.get(str(path))
+        if entry and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return entry[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.cache[str(path)] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def hash_path(self, path):
+        """Hash a file, or a directory as the names and hashes of its files (None if missing)."""
+        if path.is_file():
+            return self.hash_file(path)
+        if path.is_dir():
+            digest = hashlib.sha256()
+            for child in sorted(p for p in path.rglob('*') if p.is_file()):
+                digest.update(f'{child.relative_to(path)}\0{self.hash_file(child)}\n'.encode())
+            return digest.hexdigest()
+        return None
+
+def load_state():
+    if PIPELINE_STATE.exists():
+        return json.loads(PIPELINE_STATE.read_text())
+    return {'files': {}, 'stages': {}}
+
+def save_state(state):
+    PIPELINE_STATE.parent.mkdir(parents=True, exist_ok=True)
+    PIPELINE_STATE.write_text(json.dumps(state, indent=1))
+
+def stage_inputs(stage):
+    """Every path whose contents decide a stage's outputs."""
+    return sorted(set(stage.inputs) | local_modules(SCRIPTS_DIR / stage.script), key=str)
+
+def input_hashes(stage, hasher):
+    return {str(path): hasher.hash_path(path) for path in stage_inputs(stage)}
+
+def is_up_to_date(stage, hashes, state):
+    """True if the inputs match the last successful run and its outputs still exist."""
+    last = state['stages'].get(stage.name)
+    if last is None or last['inputs'] != hashes:
+        return False
+    return all(Path(path).exists() for path in last['outputs'])
+
+def run_stage(stage):
+    """Run one stage's script in its own process; returns (exit code, output, seconds).
+
+    Output is captured so stages running side by side don't interleave their prints.
+    """
+    for output in stage.outputs:
+        output.parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, str(SCRIPTS_DIR / stage.script)], cwd=SCRIPTS_DIR,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return result.returncode, result.stdout, time.perf_counter() - start
+
+def record_run(stage, hashes, hasher, state):
+    """Save a successful run: input hashes from before it ran, except for
+    files the stage itself rewrote, and the outputs it produced."""
+    hashes = dict(hashes)
+    for output in stage.outputs:
+        if str(output) in hashes:
+            hashes[str(output)] = hasher.hash_path(output)
+    state['stages'][stage.name] = {
+        'inputs': hashes,
+        'outputs': [str(output) for output in stage.outputs if output.exists()],
+    }
+    save_state(state)
+
+def dependencies(stages):
+    """Return {stage name: names of the stages it must wait for}.
+
+    A stage waits for every earlier stage that writes a file it reads or
+    writes, and for every earlier stage that reads a file it writes, so two
+    stages run side by side only when neither touches the other's outputs.
+    Stages left out of the run are treated as already done.
+    """
+    deps = {}
+    for i, stage in enumerate(stages):
+        reads, writes = set(stage.inputs), set(stage.outputs)
+        deps[stage.name] = {
+            earlier.name for earlier in stages[:i]
+            if set(earlier.outputs) & (reads | writes) or set(earlier.inputs) & writes
+        }
+    return deps
+
+def run_pipeline(names=None, force=False, dry_run=False, jobs=DEFAULT_JOBS):
+    """Run the named stages (all but the opt-in ones if None), up to jobs at a time.
+
+    A stage starts as soon as the stages it depends on have finished, and
+    is hashed only then, since its inputs may be their outputs. Returns
+    {stage: (status, seconds)} with status one of STATUSES.
+    """
+    state = load_state()
+    hasher = FileHasher(state['files'])
+    stages = [stage for stage in STAGES if stage.name in names] if names is not None else \
+             [stage for stage in STAGES if not stage.opt_in]
+    deps = dependencies(stages)
+    results = {}
+    pending = list(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for stage in [stage for stage in pending if deps[stage.name] <= results.keys()]:
+                pending.remove(stage)
+                upstream = {results[name][0] for name in deps[stage.name]}
+                if upstream & {'failed', 'blocked'}:
+                    print(f"[{stage.name}] blocked by a failed stage")
+                    results[stage.name] = ('blocked', None)
+                    continue
+                hashes = input_hashes(stage, hasher)
+                if not force and 'would run' not in upstream and is_up_to_date(stage, hashes, state):
+                    print(f"[{stage.name}] up to date")
+                    results[stage.name] = ('up to date', None)
+                elif dry_run:
+                    print(f"[{stage.name}] would run {stage.script}")
+                    results[stage.name] = ('would run', None)
+                else:
+                    print(f"[{stage.name}] running {stage.script}")
+                    running[executor.submit(run_stage, stage)] = (stage, hashes)
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, hashes = running.pop(future)
+                returncode, output, seconds = future.result()
+                if output:
+                    print(''.join(f"[{stage.name}] {line}\n" for line in output.splitlines()), end='')
+                if returncode == 0:
+                    record_run(stage, hashes, hasher, state)
+                    results[stage.name] = ('ran', seconds)
+                    print(f"[{stage.name}] done in {seconds:.2f}s")
+                else:
+                    results[stage.name] = ('failed', seconds)
+                    print(f"[{stage.name}] failed with exit code {returncode} after {seconds:.2f}s")
+    return results
+
+def print_summary(results, elapsed):
+    """Print each stage's status and time, and how much running side by side saved."""
+    print(f"\n{'Stage':<14} {'Status':<11} {'Seconds':>8}")
+    for name in [stage.name for stage in STAGES if stage.name in results]:
+        status, seconds = results[name]
+        print(f"{name:<14} {status:<11} {'' if seconds is None else f'{seconds:.2f}':>8}")
+    stage_time = sum(seconds for _, seconds in results.values() if seconds is not None)
+    print(f"Pipeline finished in {elapsed:.2f}s ({stage_time:.2f}s of stage time)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the NYQP analysis pipeline.')
+    parser.add_argument('stages', nargs='*', metavar='stage',
+                        help=f"stages to consider (default: all but {', '.join(stage.name for stage in STAGES if stage.opt_in)}): "
+                             f"{', '.join(stage.name for stage in STAGES)}")
+    parser.add_argument('--force', action='store_true', help='run stages even if they are up to date')
+    parser.add_argument('--dry-run', action='store_true', help='only report which stages would run')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f'most stages to run at once (default: {DEFAULT_JOBS})')
+    args = parser.parse_args()
+    unknown = set(args.stages) - {stage.name for stage in STAGES}
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    start = time.perf_counter()
+    results = run_pipeline(args.stages or None, force=args.force, dry_run=args.dry_run,
+                           jobs=max(1, args.jobs))
+    print_summary(results, time.perf_counter() - start)
+    if any(status == 'failed' for status, _ in results.values()):
+        sys.exit(1)
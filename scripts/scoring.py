@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Score every log from the database with a few set-based queries.
+
+NYQP scoring: each contact is worth QSO_POINTS for its mode class (CW and
+digital 2, phone 1), counted once per station worked per band, mode class
+and the county or state it sent (mobiles and county-line stations can be
+worked again from each county), and the total is multiplied by the
+distinct multipliers worked. Stations are compared by base call
+(callsigns.base_id), so K2A and K2A/M are the same station.
+New York stations count NY counties, US states, Canadian provinces and DX
+(once); everyone else counts NY counties only. Only non-duplicate QSOs
+inside the contest period are scored.
+
+The multiplier list lives in the multipliers table, and the results are
+stored on stations next to claimed_score (computed_points, computed_mults,
+computed_score), so logs without a claimed score can still be charted.
+create_sql_db.py scores the stations an ingest touched; run this script to
+rescore an existing database:
+
+    python scoring.py
+"""
+
+import argparse
+import sqlite3
+import time
+
+from paths import CONTEST_DB
+from summary_tables import CONTEST_MINUTES
+
+# Points per contact by qsos.mode_class
+QSO_POINTS = {'CW': 2, 'DIG': 2, 'PH': 1}
+
+NY_COUNTIES = (
+    'ALB', 'ALL', 'BRM', 'BRX', 'CAT', 'CAY', 'CHA', 'CHE', 'CGO', 'CLI',
+    'COL', 'COR', 'DEL', 'DUT', 'ERI', 'ESS', 'FRA', 'FUL', 'GEN', 'GRE',
+    'HAM', 'HER', 'JEF', 'KIN', 'LEW', 'LIV', 'MAD', 'MON', 'MTG', 'NAS',
+    'NEW', 'NIA', 'ONE', 'ONO', 'ONT', 'ORA', 'ORL', 'OSW', 'OTS', 'PUT',
+    'QUE', 'REN', 'RIC', 'ROC', 'SAR', 'SCH', 'SCO', 'SCU', 'SEN', 'STE',
+    'STL', 'SUF', 'SUL', 'TIO', 'TOM', 'ULS', 'WAR', 'WAS', 'WAY', 'WES',
+    'WYO', 'YAT',
+)
+
+# NY itself is worked as its counties
+US_STATES = (
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 'HI', 'ID',
+    'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS',
+    'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NC', 'ND', 'OH', 'OK', 'OR',
+    'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI',
+    'WY',
+)
+
+CANADIAN_PROVINCES = (
+    'AB', 'BC', 'MB', 'NB', 'NL', 'NS', 'NT', 'NU', 'ON', 'PE', 'QC', 'SK', 'YT',
+)
+
+# (code, kind) rows of the multipliers table
+MULTIPLIERS = ([(code, 'county') for code in NY_COUNTIES]
+               + [(code, 'state') for code in US_STATES]
+               + [(code, 'province') for code in CANADIAN_PROVINCES]
+               + [('DX', 'dx')])
+
+def create_multipliers_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS multipliers (
+            code TEXT PRIMARY KEY,
+            kind TEXT NOT NULL
+        )
+    ''')
+    conn.executemany('INSERT OR REPLACE INTO multipliers VALUES (?, ?)', MULTIPLIERS)
+
+def score_stations(conn, station_ids=None):
+    """Store computed_points, computed_mults and computed_score for the given station ids (all if None)."""
+    qso_filter = f'is_dup = 0 AND minute >= 0 AND minute < {CONTEST_MINUTES}'
+    station_filter = 'true'
+    params = ()
+    if station_ids is not None:
+        station_ids = sorted(station_ids)
+        if not station_ids:
+            return
+        # Numbered parameters, since the list is used in three places
+        marks = ', '.join(f'?{i}' for i in range(1, len(station_ids) + 1))
+        qso_filter += f' AND station_id IN ({marks})'
+        station_filter = f's.call_id IN ({marks})'
+        params = station_ids
+    points = ' '.join(f"WHEN '{mode_class}' THEN {value}" for mode_class, value in QSO_POINTS.items())
+
+    conn.execute(f'''
+        WITH contacts AS (
+            SELECT DISTINCT q.station_id, c.base_id, q.band, q.mode_class, UPPER(q.rx_county)
+            FROM qsos q JOIN callsigns c ON c.id = q.rx_call_id
+            WHERE {qso_filter}
+        ), points AS (
+            SELECT station_id, SUM(CASE mode_class {points} ELSE 0 END) AS points
+            FROM contacts GROUP BY station_id
+        ), worked AS (
+            SELECT DISTINCT q.station_id, m.code, m.kind
+            FROM qsos q JOIN multipliers m ON m.code = UPPER(q.rx_county)
+            WHERE {qso_filter}
+        ), mults AS (
+            SELECT s.callsign, COUNT(*) AS mults
+            FROM stations s JOIN worked w ON w.station_id = s.call_id
+            WHERE s.location = 'NY' OR w.kind = 'county'
+            GROUP BY s.callsign
+        )
+        UPDATE stations
+        SET computed_points = scored.points,
+            computed_mults = scored.mults,
+            computed_score = scored.points * scored.mults
+        FROM (
+            SELECT s.callsign, COALESCE(p.points, 0) AS points, COALESCE(m.mults, 0) AS mults
+            FROM stations s
+            LEFT JOIN points p ON p.station_id = s.call_id
+            LEFT JOIN mults m ON m.callsign = s.callsign
+            WHERE {station_filter}
+        ) AS scored
+        WHERE stations.callsign = scored.callsign
+    ''', params)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rescore every log in the contest database.')
+    parser.add_argument('--db', default=CONTEST_DB)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(args.db)
+    with conn:
+        create_multipliers_table(conn)
+        score_stations(conn)
+    logs, claimed = conn.execute(
+        'SELECT COUNT(*), COUNT(claimed_score) FROM stations').fetchone()
+    conn.close()
+    print(f"Scored {logs} logs ({logs - claimed} without a claimed score) "
+          f"in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Pre-aggregated QSO counts kept up to date by the ingest.
+
+The stats, the county map and the charts only need QSO counts grouped a few
+ways, so create_sql_db.py maintains them in small tables instead of every
+consumer grouping the whole qsos table on every run:
+
+    station_counts   QSOs and unique QSOs per station id
+    call_counts      QSOs and unique QSOs per sending call, tx_county and CW/phone
+    interval_counts  unique in-contest QSOs per 15-minute bucket, band and mode class
+    station_bands    unique QSOs per station id, band and mode class (the band
+                     and mode leaderboards)
+
+Every summary row belongs to exactly one station id's QSOs (and a station's
+duplicate flags only depend on its own QSOs), so the ingest applies deltas
+per station: before it deletes or adds any of a station's rows it subtracts
+that station's current counts, and once duplicates are flagged again it adds
+the station's new counts back.
+"""
+
+# Length of the contest period starting at create_sql_db.CONTEST_START; only
+# QSOs inside it are bucketed (imported from here by every other module)
+CONTEST_MINUTES = 12 * 60
+
+# name: (column definitions, [(key column, expression over qsos)],
+#        [(count column, expression)], filter on qsos)
+SUMMARIES = {
+    'station_counts': (
+        'station_id INTEGER PRIMARY KEY, qsos INTEGER NOT NULL, unique_qsos INTEGER NOT NULL',
+        [('station_id', 'station_id')],
+        [('qsos', 'COUNT(*)'), ('unique_qsos', 'SUM(is_dup = 0)')],
+        None,
+    ),
+    'call_counts': (
+        'tx_call_id INTEGER NOT NULL, tx_county TEXT NOT NULL, cw INTEGER NOT NULL, '
+        'qsos INTEGER NOT NULL, unique_qsos INTEGER NOT NULL, PRIMARY KEY (tx_call_id, tx_county, cw)',
+        [('tx_call_id', 'tx_call_id'), ('tx_county', "COALESCE(tx_county, '')"), ('cw', "instr(mode, 'CW') > 0")],
+        [('qsos', 'COUNT(*)'), ('unique_qsos', 'SUM(is_dup = 0)')],
+        None,
+    ),
+    'interval_counts': (
+        'bucket INTEGER NOT NULL, band INTEGER NOT NULL, mode_class TEXT NOT NULL, '
+        'qsos INTEGER NOT NULL, PRIMARY KEY (bucket, band, mode_class)',
+        [('bucket', 'minute / 15'), ('band', 'band'), ('mode_class', 'mode_class')],
+        [('qsos', 'COUNT(*)')],
+        f'is_dup = 0 AND minute >= 0 AND minute < {CONTEST_MINUTES} AND band IS NOT NULL',
+    ),
+    # QSOs without a band are kept under band -1, which has no bands row,
+    # so they still count towards the mode leaderboard
+    'station_bands': (
+        'station_id INTEGER NOT NULL, band INTEGER NOT NULL, mode_class TEXT NOT NULL, '
+        'qsos INTEGER NOT NULL, PRIMARY KEY (station_id, band, mode_class)',
+        [('station_id', 'station_id'), ('band', 'COALESCE(band, -1)'), ('mode_class', 'mode_class')],
+        [('qsos', 'COUNT(*)')],
+        'is_dup = 0',
+    ),
+}
+
+def create_summary_tables(conn):
+    for name, (columns, _, _, _) in SUMMARIES.items():
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {name} ({columns})')
+
+def apply_station_deltas(conn, station_ids=None, sign=1):
+    """Add (sign=1) or subtract (sign=-1) the counts of the given stations' QSOs.
+
+    station_ids=None means every QSO, for filling the tables after a full
+    build. Rows whose counts drop to zero are removed.
+    """
+    if station_ids is not None:
+        station_ids = sorted(station_ids)
+        if not station_ids:
+            return
+    for name, (_, keys, counts, where) in SUMMARIES.items():
+        filters = [] if where is None else [where]
+        params = ()
+        if station_ids is not None:
+            # Spelled out so the planner reads just these stations' rows
+            filters.append(f"station_id IN ({', '.join('?' * len(station_ids))})")
+            params = station_ids
+        key_columns = ', '.join(column for column, _ in keys)
+        key_exprs = ', '.join(expr for _, expr in keys)
+        conn.execute(f'''
+            INSERT INTO {name} ({key_columns}, {', '.join(column for column, _ in counts)})
+            SELECT {key_exprs}, {', '.join(f'{sign} * {expr}' for _, expr in counts)}
+            FROM qsos
+            WHERE {' AND '.join(filters) or 'true'}
+            GROUP BY {key_exprs}
+            ON CONFLICT ({key_columns}) DO UPDATE SET
+                {', '.join(f'{column} = {column} + excluded.{column}' for column, _ in counts)}
+        ''', params)
+        if sign < 0:
+            conn.execute(f'DELETE FROM {name} WHERE {counts[0][0]} = 0')
+
+class SummaryDeltas:
+    """Tracks which stations' counts an incremental ingest has taken out.
+
+    Call release() with a station's ids before changing any of its QSO rows
+    and finish() after duplicates are re-flagged.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.released = set()
+
+    def release(self, station_ids):
+        new = set(station_ids) - self.released
+        apply_station_deltas(self.conn, new, sign=-1)
+        self.released |= new
+
+    def finish(self):
+        apply_station_deltas(self.conn, self.released, sign=1)
+        self.released = set()
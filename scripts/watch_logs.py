@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Live contest mode: watch the logs directory and keep the outputs current.
+
+The watcher polls the logs directory and waits until no log has changed
+size or mtime for one poll, so files still being written are not ingested
+half-done. It then runs the incremental ingest (only new, changed or
+deleted logs touch the database) and updates the running totals:
+
+- contest_stats.json/.html, the same numbers generate_stats.py produces
+- county_counts.json, QSOs per tx_county
+- hourly_qsos.json, QSOs per contest hour
+
+Totals are kept per log, so a changed log only costs the queries for that
+log's rows. Afterwards only the pipeline stages whose outputs can have
+changed are re-run: the county map only when some station's QSOs from a
+county moved (its totals and top stations), the mobile animation only when
+a mobile log changed or a worked county's QSO count moved.
+
+    python watch_logs.py               # poll every 5 seconds until Ctrl-C
+    python watch_logs.py --once        # ingest whatever has settled, then exit
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from collections import Counter
+
+from create_sql_db import CONTEST_MINUTES, CONTEST_START, NYQPDatabaseCreator
+from generate_stats import StationRow, compute_stats, format_stats_html
+from log_sources import list_sources
+from paths import CONTEST_DB, COUNTY_COUNTS_JSON, HOURLY_QSOS_JSON, LOGS_DIR, STATS_HTML, STATS_JSON
+from run_pipeline import DEFAULT_JOBS, print_summary, run_pipeline
+
+# Stages re-run after every ingest; the maps are added only when needed
+REFRESH_STAGES = ['match', 'charts', 'thumbnails']
+
+def snapshot(logs_dir):
+    """Return {log name: (size, mtime_ns)} for every log in logs_dir."""
+    return {source.name: (source.size, source.mtime_ns) for source in list_sources(logs_dir)}
+
+def log_totals(conn, log_names):
+    """Return {log name: that log's share of the totals} for the given logs.
+
+    Each share holds its stations row (if it still has one) and its QSO
+    counts per station id, county, (county, sending call id) as ranked on
+    the county leaderboard, hour and worked rx_county. Logs without rows are
+    left out.
+    """
+    totals = {}
+    marks = ', '.join('?' * len(log_names))
+
+    def share(log_name):
+        return totals.setdefault(log_name, {
+            'station': None, 'station_qsos': Counter(), 'counties': Counter(),
+            'county_calls': Counter(), 'hours': Counter(), 'worked': Counter(),
+        })
+
+    for log_name, *row in conn.execute(f"""
+        SELECT log_file, {', '.join(StationRow._fields)}
+        FROM stations WHERE log_file IN ({marks})
+    """, log_names):
+        share(log_name)['station'] = StationRow(*row)
+    for log_name, station_id, county, tx_call_id, hour, count in conn.execute(f"""
+        SELECT log_file, station_id, UPPER(tx_county), tx_call_id,
+               CASE WHEN minute >= 0 THEN minute / 60 END AS hour, COUNT(*)
+        FROM qsos WHERE log_file IN ({marks})
+        GROUP BY log_file, station_id, UPPER(tx_county), tx_call_id, hour
+    """, log_names):
+        totals_for_log = share(log_name)
+        totals_for_log['station_qsos'][station_id] += count
+        if county:
+            totals_for_log['counties'][county] += count
+            totals_for_log['county_calls'][county, tx_call_id] += count
+        if hour is not None and hour < CONTEST_MINUTES // 60:
+            totals_for_log['hours'][hour] += count
+    for log_name, county, count in conn.execute(f"""
+        SELECT log_file, rx_county, COUNT(*)
+        FROM qsos WHERE log_file IN ({marks}) AND rx_county IS NOT NULL
+        GROUP BY log_file, rx_county
+    """, log_names):
+        share(log_name)['worked'][county] += count
+    return totals
+
+class LiveTotals:
+    """Contest totals kept as the sum of each log's share.
+
+    update() replaces the shares of the logs an ingest changed and of the
+    logs whose station shares their callsign (their stations row may have
+    moved), so the totals always match a full recount.
+    """
+
+    def __init__(self, conn):
+        self.logs = {}
+        names = [row[0] for row in conn.execute(
+            'SELECT log_file FROM stations UNION SELECT DISTINCT log_file FROM qsos')]
+        if names:
+            self.logs = log_totals(conn, names)
+
+    def affected_logs(self, conn, changed_logs):
+        """changed_logs plus every log whose station shares a callsign with one of them."""
+        call_ids = {share['station'].call_id for name, share in self.logs.items()
+                    if name in changed_logs and share['station']}
+        if changed_logs:
+            marks = ', '.join('?' * len(changed_logs))
+            call_ids |= {row[0] for row in conn.execute(
+                f'SELECT call_id FROM stations WHERE log_file IN ({marks})', list(changed_logs))}
+        affected = set(changed_logs)
+        if call_ids:
+            marks = ', '.join('?' * len(call_ids))
+            affected |= {row[0] for row in conn.execute(
+                f'SELECT log_file FROM stations WHERE call_id IN ({marks})', list(call_ids))}
+        return affected
+
+    def update(self, conn, changed_logs):
+        """Recount the logs touched by an ingest; returns the shares they replaced and their new ones."""
+        affected = sorted(self.affected_logs(conn, changed_logs))
+        before = {name: self.logs.pop(name) for name in affected if name in self.logs}
+        after = log_totals(conn, affected) if affected else {}
+        self.logs.update(after)
+        return before, after
+
+    def stations(self):
+        return [share['station'] for share in self.logs.values() if share['station']]
+
+    def stats(self):
+        """The generate_stats.py statistics, from the per-log shares."""
+        station_qsos = Counter()
+        for share in self.logs.values():
+            station_qsos.update(share['station_qsos'])
+        return compute_stats(self.stations(), station_qsos)
+
+    def county_counts(self):
+        counts = Counter()
+        for share in self.logs.values():
+            counts.update(share['counties'])
+        return dict(sorted(counts.items()))
+
+    def hourly_qsos(self):
+        counts = Counter()
+        for share in self.logs.values():
+            counts.update(share['hours'])
+        return [counts[hour] for hour in range(CONTEST_MINUTES // 60)]
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+def write_outputs(totals):
+    """Write the stats, county and hourly files from the running totals."""
+    stats = totals.stats()
+    write_json(STATS_JSON, stats)
+    STATS_HTML.parent.mkdir(parents=True, exist_ok=True)
+    with open(STATS_HTML, 'w') as f:
+        f.write(format_stats_html(stats))
+    write_json(COUNTY_COUNTS_JSON, totals.county_counts())
+    write_json(HOURLY_QSOS_JSON, {
+        'contest_start': CONTEST_START.strftime('%Y-%m-%d %H:%M:%S'),
+        'qsos_per_hour': totals.hourly_qsos(),
+    })
+    return stats
+
+def moved(before, after, key):
+    """Whether the sum of one count of the shares differs between before and after."""
+    delta = Counter()
+    for share in after.values():
+        delta.update(share[key])
+    for share in before.values():
+        delta.subtract(share[key])
+    return any(delta.values())
+
+def stages_to_refresh(before, after):
+    """Pipeline stages whose outputs depend on what changed between two sets of log shares."""
+    stages = list(REFRESH_STAGES)
+    # The county map shows each county's total and top stations
+    if moved(before, after, 'county_calls'):
+        stages.append('enhanced_map')
+    # The animation shows the mobile tracks over the QSOs per worked county
+    shares = list(before.values()) + list(after.values())
+    if moved(before, after, 'worked') or any(
+            share['station'] and 'MOBILE' in (share['station'].station_type or '').upper()
+            for share in shares):
+        stages.append('animated_map')
+    return stages
+
+class LogWatcher:
+    """Polls a logs directory and refreshes the database and outputs when it settles."""
+
+    def __init__(self, logs_dir=LOGS_DIR, db_path=CONTEST_DB, workers=1, jobs=DEFAULT_JOBS):
+        # Readers such as the web pages keep using the old file until the
+        # updated one is renamed into place
+        self.creator = NYQPDatabaseCreator(logs_dir, db_path, workers=workers, in_memory=True)
+        self.logs_dir = logs_dir
+        self.db_path = db_path
+        self.jobs = jobs
+        self.ingested = None
+        self.totals = None
+
+    def refresh(self):
+        """Ingest changed logs, update the totals and re-run the affected stages."""
+        start = time.perf_counter()
+        changed_logs = self.creator.create_database()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if self.totals is None:
+                self.totals = LiveTotals(conn)
+                before, after = {}, self.totals.logs
+            else:
+                before, after = self.totals.update(conn, changed_logs)
+        finally:
+            conn.close()
+        stats = write_outputs(self.totals)
+        print(f"Totals: {stats['total_logs']} logs, {stats['total_qsos']:,} QSOs "
+              f"({len(changed_logs)} logs changed, {time.perf_counter() - start:.2f}s)")
+
+        if changed_logs:
+            results = run_pipeline(stages_to_refresh(before, after), jobs=self.jobs)
+            print_summary(results, time.perf_counter() - start)
+
+    def watch(self, interval=5.0, once=False):
+        """Refresh whenever the logs directory changes and then holds still for one poll."""
+        previous = None
+        while True:
+            current = snapshot(self.logs_dir)
+            if current == previous and current != self.ingested:
+                self.refresh()
+                self.ingested = current
+                if once:
+                    return
+            elif once and current == self.ingested:
+                return
+            previous = current
+            time.sleep(interval)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Watch the logs directory and update outputs as logs arrive.')
+    parser.add_argument('--logs-dir', default=LOGS_DIR)
+    parser.add_argument('--db', default=CONTEST_DB)
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help='seconds between polls; a log must be unchanged for one poll to be ingested')
+    parser.add_argument('--workers', type=int, default=1, help='parser processes for the ingest')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS, help='most pipeline stages at once')
+    parser.add_argument('--once', action='store_true', help='refresh once the directory settles, then exit')
+    args = parser.parse_args()
+
+    watcher = LogWatcher(args.logs_dir, args.db, workers=args.workers, jobs=max(1, args.jobs))
+    try:
+        watcher.watch(args.interval, once=args.once)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
@@ -1,31 +1,16 @@
 #!/usr/bin/env python3
-import sqlite3
 import json
+from datetime import timedelta
+
+from contest_data import mobile_county_qsos, mobile_stations, track_points, worked_county_qsos
+from create_sql_db import CONTEST_MINUTES, CONTEST_START
+from paths import ANIMATED_MAP_HTML, CONTEST_DB, COUNTY_BOUNDARIES_JSON
+from qso_record import Track
 
 def get_mobile_stations_from_db():
     """Get mobile stations from database based on CATEGORY-STATION: MOBILE"""
-    meta_conn = sqlite3.connect('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data/contest_meta.db')
-    qso_conn = sqlite3.connect('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data/contest_qsos.db')
-    mobile_stations = []
-    
-    # Get mobile log files from meta database
-    mobile_logs = []
-    for row in meta_conn.execute('SELECT log_file FROM stations WHERE station_type = "MOBILE"'):
-        mobile_logs.append(row[0])
-    
-    # Get actual CALLSIGN from QSO records (now corrected in database)
-    for log_file in mobile_logs:
-        for row in qso_conn.execute('SELECT DISTINCT station_call FROM qsos WHERE log_file = ? LIMIT 1', (log_file,)):
-            callsign = row[0]
-            mobile_stations.append({
-                'callsign': callsign,
-                'log_file': log_file
-            })
-            break
-    
-    meta_conn.close()
-    qso_conn.close()
-    return mobile_stations
+    return [{'callsign': station.callsign, 'log_file': station.log_file}
+            for station in mobile_stations(CONTEST_DB)]
 
 def get_ny_counties():
     """Return list of NY county abbreviations"""
@@ -59,38 +44,18 @@ def get_county_names():
 
 def load_database_data():
     """Load all required data from database"""
-    conn = sqlite3.connect('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data/contest_qsos.db')
-    
     # Get county QSO counts for coloring
     ny_counties = get_ny_counties()
-    county_counts = {}
-    for row in conn.execute('''
-        SELECT rx_county, COUNT(*) as qsos
-        FROM qsos 
-        WHERE rx_county IN ({})
-        GROUP BY rx_county
-    '''.format(','.join(['?']*len(ny_counties))), ny_counties):
-        county_counts[row[0]] = row[1]
+    county_counts = worked_county_qsos(ny_counties, CONTEST_DB)
     
     # Get mobile QSO data (only from NY counties)
-    mobile_stations = get_mobile_stations_from_db()
-    mobile_logs = [station['log_file'] for station in mobile_stations]
+    mobile_logs = [station['log_file'] for station in get_mobile_stations_from_db()]
     mobile_qsos = {}
-    for row in conn.execute('''
-        SELECT station_call, datetime, tx_county
-        FROM qsos 
-        WHERE log_file IN ({}) AND tx_county IN ({})
-        ORDER BY station_call, datetime
-    '''.format(','.join(['?']*len(mobile_logs)), ','.join(['?']*len(ny_counties))), mobile_logs + ny_counties):
-        call = row[0]
-        if call not in mobile_qsos:
-            mobile_qsos[call] = []
-        mobile_qsos[call].append({
-            'datetime': row[1],
-            'county': row[2]
-        })
+    for qso in mobile_county_qsos(mobile_logs, ny_counties, CONTEST_DB):
+        if qso.call not in mobile_qsos:
+            mobile_qsos[qso.call] = Track(CONTEST_START)
+        mobile_qsos[qso.call].append(qso.minute, qso.county)
     
-    conn.close()
     return county_counts, mobile_qsos
 
 def load_reference_data():
@@ -98,7 +63,7 @@ def load_reference_data():
     
     # Load NY counties GeoJSON from downloaded file
     print("Loading NY counties GeoJSON...")
-    with open('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/reference/ny-counties-boundaries.json', 'r') as f:
+    with open(COUNTY_BOUNDARIES_JSON, 'r') as f:
         boundaries = json.load(f)
     
     # Generate mobile config with unique icons/colors (only for stations with NY activity)
@@ -108,31 +73,21 @@ def load_reference_data():
     colors = ["red", "blue", "green", "orange", "yellow", "purple", "brown", "cyan", "pink", "darkred", "gray", "darkblue", "darkgreen", "black"]
     
     # Generate mobile tracks from database
-    conn = sqlite3.connect('/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/data/contest_qsos.db')
     mobile_tracks = {}
     ny_counties = get_ny_counties()
     
     for station in mobile_stations:
         log_file = station['log_file']
         call = station['callsign']  # Use callsign from metadata, not filename
-        mobile_tracks[call] = []
+        mobile_tracks[call] = Track(CONTEST_START)
         
-        for row in conn.execute('''
-            SELECT datetime, tx_county
-            FROM qsos 
-            WHERE log_file = ?
-            ORDER BY datetime
-        ''', (log_file,)):
+        for point in track_points(log_file, CONTEST_DB):
             # Only include QSOs from NY counties
-            if row[1] in ny_counties:
-                mobile_tracks[call].append({
-                    'timestamp': row[0],
-                    'county': row[1]
-                })
+            if point.county in ny_counties:
+                mobile_tracks[call].append(point.minute, point.county)
     
     # Remove mobiles with no NY activity
     mobile_tracks = {call: track for call, track in mobile_tracks.items() if track}
-    conn.close()
     
     # Only create config for mobiles with NY activity
     mobile_config = {}
@@ -171,18 +126,23 @@ def load_reference_data():
                 (min_lng + max_lng) / 2
             ]
     
-    return json.dumps(boundaries), json.dumps(mobile_config), json.dumps(mobile_tracks), json.dumps(county_coords)
+    mobile_tracks_json = json.dumps({call: track.to_json('timestamp') for call, track in mobile_tracks.items()})
+    return json.dumps(boundaries), json.dumps(mobile_config), mobile_tracks_json, json.dumps(county_coords)
 
 def generate_html(county_counts, mobile_qsos, boundaries_json, mobile_config_json, mobile_tracks_json, county_coords_json):
     """Generate the complete HTML content"""
     county_names = get_county_names()
+    # Contest period as the local-time strings the page's Date objects use
+    start = CONTEST_START.strftime('%Y-%m-%dT%H:%M:%S')
+    first_hour_end = (CONTEST_START + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S')
+    end = (CONTEST_START + timedelta(minutes=CONTEST_MINUTES)).strftime('%Y-%m-%dT%H:%M:%S')
     
     return f'''<!DOCTYPE html>
 <html>
 <head>
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=3.0, user-scalable=yes, viewport-fit=cover">
-    <title>NYQP 2025 Mobile Activity</title>
+    <title>NYQP {CONTEST_START.year} Mobile Activity</title>
     <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css"/>
     <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
     <script src="https://unpkg.com/@turf/turf@6/turf.min.js"></script>
@@ -329,13 +289,13 @@ def generate_html(county_counts, mobile_qsos, boundaries_json, mobile_config_jso
             <button class="control-btn" onclick="changeSpeed(1)">⏩ Faster</button>
         </div>
         <div class="control-row">
-            <div id="time-display">2025-10-18 14:00Z</div>
+            <div id="time-display">{CONTEST_START:%Y-%m-%d %H:%M}Z</div>
             <div id="progress-container" onclick="seekToPosition(event)">
                 <div id="progress-bar"></div>
                 <div id="progress-text">0%</div>
             </div>
         </div>
-        <div id="stats">NYQP 2025 Mobile Activity | QSOs: <span id="qso-count">0</span> | Counties Covered: <span id="active-counties">0</span></div>
+        <div id="stats">NYQP {CONTEST_START.year} Mobile Activity | QSOs: <span id="qso-count">0</span> | Counties Covered: <span id="active-counties">0</span></div>
     </div>
     <script>
         // Data from Python
@@ -345,7 +305,7 @@ def generate_html(county_counts, mobile_qsos, boundaries_json, mobile_config_jso
         const mobileConfig = {mobile_config_json};
         const mobileTracks = {mobile_tracks_json};
         const countyCoords = {county_coords_json};
-        const mobileQSOs = {json.dumps(mobile_qsos)};
+        const mobileQSOs = {json.dumps({call: track.to_json('datetime') for call, track in mobile_qsos.items()})};
         
         // Function to clean up callsigns for display
         function cleanCallsign(call) {{
@@ -357,7 +317,7 @@ def generate_html(county_counts, mobile_qsos, boundaries_json, mobile_config_jso
         
         // Animation state
         let isPlaying = false;
-        let currentTime = new Date('2025-10-18T14:00:00');
+        let currentTime = new Date('{start}');
         let animationSpeed = 100;
         let animationInterval;
         let mobileMarkers = {{}};
@@ -442,8 +402,8 @@ def generate_html(county_counts, mobile_qsos, boundaries_json, mobile_config_jso
             document.getElementById('qso-count').textContent = state.totalQSOs.toLocaleString();
             document.getElementById('active-counties').textContent = state.countiesCovered.size;
             
-            const totalMinutes = (new Date('2025-10-19T02:00:00') - new Date('2025-10-18T14:00:00')) / 60000;
-            const currentMinutes = (currentTime - new Date('2025-10-18T14:00:00')) / 60000;
+            const totalMinutes = (new Date('{end}') - new Date('{start}')) / 60000;
+            const currentMinutes = (currentTime - new Date('{start}')) / 60000;
             const progress = Math.min((currentMinutes / totalMinutes) * 100, 100);
             
             document.getElementById('progress-bar').style.width = progress + '%';
@@ -559,10 +519,10 @@ def generate_html(county_counts, mobile_qsos, boundaries_json, mobile_config_jso
         
         function hasFirstHourActivity(call) {{
             if (!mobileQSOs[call]) return false;
-            const firstHourEnd = new Date('2025-10-18T15:00:00');
+            const firstHourEnd = new Date('{first_hour_end}');
             const hasActivity = mobileQSOs[call].some(qsoEntry => {{
                 const qsoTime = new Date(qsoEntry.datetime);
-                return qsoTime >= new Date('2025-10-18T14:00:00') && qsoTime <= firstHourEnd;
+                return qsoTime >= new Date('{start}') && qsoTime <= firstHourEnd;
             }});
             if (call === 'AB1BL') {{
                 console.log('AB1BL first hour check:', hasActivity);
@@ -741,7 +701,7 @@ def generate_html(county_counts, mobile_qsos, boundaries_json, mobile_config_jso
                 updateDisplay(state);
                 updateMobileMarkers(state);
                 
-                if (currentTime >= new Date('2025-10-19T02:00:00')) {{
+                if (currentTime >= new Date('{end}')) {{
                     pauseAnimation();
                 }}
             }}, animationSpeed);
@@ -757,7 +717,7 @@ def generate_html(county_counts, mobile_qsos, boundaries_json, mobile_config_jso
         
         function resetAnimation() {{
             pauseAnimation();
-            currentTime = new Date('2025-10-18T14:00:00');
+            currentTime = new Date('{start}');
             
             const state = calculateAnimationState(currentTime);
             
@@ -792,10 +752,10 @@ def generate_html(county_counts, mobile_qsos, boundaries_json, mobile_config_jso
             const clickX = event.clientX - rect.left;
             const percentage = clickX / rect.width;
             
-            const totalMinutes = (new Date('2025-10-19T02:00:00') - new Date('2025-10-18T14:00:00')) / 60000;
+            const totalMinutes = (new Date('{end}') - new Date('{start}')) / 60000;
             const targetMinutes = percentage * totalMinutes;
             
-            currentTime = new Date(new Date('2025-10-18T14:00:00').getTime() + (targetMinutes * 60000));
+            currentTime = new Date(new Date('{start}').getTime() + (targetMinutes * 60000));
             
             const state = calculateAnimationState(currentTime);
             updateDisplay(state);
@@ -1077,7 +1037,8 @@ def generate_animated_map():
         mobile_config_json, mobile_tracks_json, county_coords_json
     )
     
-    output_path = '/home/mgilmer/Downloads/QSO_PARTIES/NYQP-2025/analysis/outputs/html/nyqp_2025_mobile_animation.html'
+    output_path = ANIMATED_MAP_HTML
+    output_path.parent.mkdir(parents=True, exist_ok=True)
     with open(output_path, 'w') as f:
         f.write(html_content)
     
@@ -1089,7 +1050,7 @@ def generate_animated_map():
         first_station = list(mobile_qsos.keys())[0]
         print(f"Sample QSOs for {first_station}: {len(mobile_qsos[first_station])} QSOs")
         if mobile_qsos[first_station]:
-            print(f"First QSO: {mobile_qsos[first_station][0]}")
+            print(f"First QSO: {mobile_qsos[first_station].to_json('datetime')[0]}")
 
 if __name__ == '__main__':
     generate_animated_map()
\ No newline at end of file